@@ -1,16 +1,13 @@
 import json
-import os
 import uuid
 from datetime import datetime, timezone, timedelta
-import boto3
-
-dynamodb = boto3.resource('dynamodb')
-ACCOUNTS_TABLE_NAME = os.environ.get('ACCOUNTS_TABLE_NAME', 'Accounts')
-accounts_table = dynamodb.Table(ACCOUNTS_TABLE_NAME)
+import storage
 
 def lambda_handler(event, context):
     # TODO implement
     try:
+        store = storage.get_store()
+        store.start_invocation(context)
         if "body" in event:
             body = json.loads(event['body'] or "{}")
         else:
@@ -36,7 +33,7 @@ def lambda_handler(event, context):
             'is_active': True
         }
 
-        accounts_table.put_item(Item=item)
+        store.put_account(item)
 
         return {
             "statusCode": 200,
@@ -49,6 +46,13 @@ def lambda_handler(event, context):
                 "account": item
             })
         }
+    except storage.Overloaded as e:
+        print("Store overloaded in add_account:", str(e))
+        return {
+            "statusCode": 503,
+            "headers": {"Access-Control-Allow-Origin": "*", "Retry-After": "1"},
+            "body": json.dumps({"message":"Service busy, please retry","error":str(e)})
+        }
     except Exception as e:
         print("Error in add_account:", str(e))
         return {
@@ -1,17 +1,28 @@
 import json
-import os
-import boto3
 import uuid
 from decimal import Decimal
-from datetime import datetime, timezone, timedelta
+import purchy_cache
+import purchy_keys
+import storage
 
 
-dynamodb = boto3.resource('dynamodb')
-PURCHIES_TABLE_NAME = os.environ.get('PURCHIES_TABLE_NAME','Purchies')
-purchies_table = dynamodb.Table(PURCHIES_TABLE_NAME)
+MAX_KEY_ATTEMPTS = 3
+
+def put_new_purchy(store, item):
+    """Put item under a fresh purchy_ts, never overwriting an existing purchy."""
+    for _ in range(MAX_KEY_ATTEMPTS):
+        item["purchy_ts"] = purchy_keys.new_purchy_ts()
+        try:
+            store.put_purchy(item)
+            return item["purchy_ts"]
+        except storage.AlreadyExists:
+            print("purchy_ts collision, retrying:", item["purchy_ts"])
+    raise RuntimeError("Could not allocate a unique purchy_ts")
 
 def lambda_handler(event, context):
     try:
+        store = storage.get_store()
+        store.start_invocation(context)
         if "body" in event:
             body = json.loads(event['body'] or '{}')
         else:
@@ -28,12 +39,8 @@ def lambda_handler(event, context):
                 'statusCode': 400,
                 'body': json.dumps('Missing required fields')
             }
-        now = datetime.now(timezone(timedelta(hours=5, minutes=30)))
-        purchy_ts = now.isoformat(timespec='seconds')
-
         item = {
             "account_id": account_id,
-            "purchy_ts": purchy_ts,
             "purchy_id": purchy_id,
             "purchy_date": date_str,
             "weight": Decimal(str((weight))),
@@ -41,14 +48,22 @@ def lambda_handler(event, context):
             "rate": 405
         }
 
-        purchies_table.put_item(Item=item)
+        purchy_ts = put_new_purchy(store, item)
+        purchy_cache.invalidate(account_id, purchy_ts)
         return {
             'statusCode': 200,
             'headers': {
                 'Content-Type': 'application/json',
                 'Access-Control-Allow-Origin': '*'
             },
-            'body': json.dumps({"message": "Purchy recorded successfully"})#, "data": item})
+            'body': json.dumps({"message": "Purchy recorded successfully", "purchy_ts": purchy_ts})#, "data": item})
+        }
+    except storage.Overloaded as e:
+        print("Store overloaded in add_purchy:", str(e))
+        return {
+            'statusCode': 503,
+            'headers': {'Access-Control-Allow-Origin': '*', 'Retry-After': '1'},
+            'body': json.dumps(f'Service busy, please retry: {str(e)}')
         }
     except Exception as e:
         return {
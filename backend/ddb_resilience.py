@@ -0,0 +1,235 @@
+import os
+import time
+import random
+import threading
+from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError, HTTPClientError
+
+# Config from env
+MAX_ATTEMPTS = int(os.environ.get("DDB_MAX_ATTEMPTS", "6"))
+BACKOFF_BASE_SECONDS = int(os.environ.get("DDB_BACKOFF_BASE_MS", "50")) / 1000
+BACKOFF_MAX_SECONDS = int(os.environ.get("DDB_BACKOFF_MAX_MS", "2000")) / 1000
+DEADLINE_RESERVE_MS = int(os.environ.get("DDB_DEADLINE_RESERVE_MS", "500"))  # kept back to build the response
+INITIAL_RATE = float(os.environ.get("DDB_RATE", "50"))                         # requests/second per container
+MIN_RATE = float(os.environ.get("DDB_MIN_RATE", "1"))
+MAX_RATE = float(os.environ.get("DDB_MAX_RATE", "500"))
+
+THROTTLE_CODES = {
+    "ProvisionedThroughputExceededException",
+    "ThrottlingException",
+    "RequestLimitExceeded",
+}
+# A 5xx leaves it unknown whether the request was applied before failing
+AMBIGUOUS_CODES = {"InternalServerError", "ServiceUnavailable"}
+RETRYABLE_CODES = THROTTLE_CODES | AMBIGUOUS_CODES
+
+# Network failures (EndpointConnectionError, ConnectTimeoutError, ReadTimeoutError,
+# ConnectionClosedError, ...). With botocore's retries off these are ours to retry;
+# like a 5xx they leave it unknown whether a write was applied.
+NETWORK_ERRORS = (BotoConnectionError, HTTPClientError)
+
+# CancellationReasons[].Code of a TransactionCanceledException worth retrying
+TRANSACTION_THROTTLE_REASONS = {"ThrottlingError", "ProvisionedThroughputExceeded"}
+TRANSACTION_RETRY_REASONS = TRANSACTION_THROTTLE_REASONS | {"TransactionConflict"}
+
+# This layer owns retries; botocore's own retries would multiply with ours
+BOTO_CONFIG = Config(retries={"mode": "standard", "max_attempts": 1})
+
+
+class ThrottledError(Exception):
+    """DynamoDB kept throttling (or failing transiently) after MAX_ATTEMPTS."""
+
+
+class DeadlineExceeded(Exception):
+    """Not enough Lambda time left for another attempt."""
+
+
+OVERLOAD_ERRORS = (ThrottledError, DeadlineExceeded)
+
+
+# ---------- Building blocks ----------
+
+class TokenBucket:
+    """
+    Client-side rate limiter. The refill rate adapts to what DynamoDB tells us:
+    halved on every throttle, raised by one request/second on every success (AIMD).
+    """
+
+    def __init__(self, rate, min_rate, max_rate):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.tokens = max(1.0, rate)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        capacity = max(1.0, self.rate)  # allow a one-second burst
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, deadline):
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            sleep_within(wait, deadline)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + 1)
+
+    def on_throttle(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, max(1.0, self.rate))
+
+
+class Deadline:
+    """Wall-clock budget of the current invocation (None = unbounded)."""
+
+    def __init__(self, expires_at=None):
+        self.expires_at = expires_at
+
+    @classmethod
+    def from_context(cls, context, reserve_ms=DEADLINE_RESERVE_MS):
+        if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+            return cls(None)
+        remaining_ms = max(0, context.get_remaining_time_in_millis() - reserve_ms)
+        return cls(time.monotonic() + remaining_ms / 1000)
+
+    def remaining(self):
+        if self.expires_at is None:
+            return float("inf")
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+
+def sleep_within(delay, deadline):
+    if delay >= deadline.remaining():
+        raise DeadlineExceeded(f"no time left to wait {delay:.3f}s")
+    time.sleep(delay)
+
+
+# The rate limit is shared by the whole process; the deadline belongs to the
+# request being served, and local_server.py serves several at once on threads.
+_bucket = TokenBucket(INITIAL_RATE, MIN_RATE, MAX_RATE)
+_state = threading.local()
+NO_DEADLINE = Deadline(None)
+
+
+def current_deadline():
+    return getattr(_state, "deadline", NO_DEADLINE)
+
+
+def set_deadline(deadline):
+    """Bind a deadline to the calling thread (e.g. a worker querying on behalf of a request)."""
+    _state.deadline = deadline
+
+
+def start_invocation(context):
+    """Call at the top of every lambda_handler to bound retries by the remaining time."""
+    set_deadline(Deadline.from_context(context))
+
+
+def error_code(e):
+    if isinstance(e, ClientError):
+        return e.response.get("Error", {}).get("Code")
+    return None
+
+
+def classify(e):
+    """Return (retryable, throttled) for a ClientError."""
+    code = error_code(e)
+    if code == "TransactionCanceledException":
+        reasons = {r.get("Code") for r in e.response.get("CancellationReasons", [])}
+        if "ConditionalCheckFailed" in reasons or not reasons & TRANSACTION_RETRY_REASONS:
+            return False, False
+        return True, bool(reasons & TRANSACTION_THROTTLE_REASONS)
+    return code in RETRYABLE_CODES, code in THROTTLE_CODES
+
+
+# ---------- Public API ----------
+
+def call(fn, *args, **kwargs):
+    """
+    Run one DynamoDB call (e.g. call(table.query, KeyConditionExpression=...)).
+    Throttles, throttled/conflicting transactions, transient 5xx and connection
+    errors/timeouts are retried with backoff; everything else
+    (ConditionalCheckFailedException, validation errors, ...) is raised untouched.
+
+    A 5xx or a timeout does not tell whether the write was applied, so a conditional
+    write retried after one may fail its condition against its own earlier attempt.
+    Such errors carry `after_ambiguous_retry = True` for the caller to check
+    (transactions should pass a ClientRequestToken instead).
+    Raises ThrottledError or DeadlineExceeded when giving up.
+    """
+    deadline = current_deadline()
+    attempt = 0
+    ambiguous = False
+    while True:
+        if deadline.expired():
+            raise DeadlineExceeded("invocation deadline reached")
+        _bucket.acquire(deadline)
+        try:
+            result = fn(*args, **kwargs)
+        except ClientError as e:
+            code = error_code(e)
+            retryable, throttled = classify(e)
+            if not retryable:
+                e.after_ambiguous_retry = ambiguous
+                raise
+            if throttled:
+                _bucket.on_throttle()
+            if code in AMBIGUOUS_CODES:
+                ambiguous = True
+            error = e
+        except NETWORK_ERRORS as e:
+            code = type(e).__name__
+            ambiguous = True
+            error = e
+        else:
+            _bucket.on_success()
+            return result
+        attempt += 1
+        if attempt >= MAX_ATTEMPTS:
+            raise ThrottledError(f"{code} after {attempt} attempts") from error
+        sleep_within(backoff_delay(attempt), deadline)
+
+
+def batch_get_item(client, request_items):
+    """
+    BatchGetItem that retries UnprocessedKeys with backoff instead of a tight loop.
+    Returns (responses_by_table, unprocessed_keys); unprocessed_keys is non-empty
+    when attempts or time ran out, so callers can return what they have.
+    """
+    responses = {}
+    attempt = 0
+    while request_items:
+        resp = call(client.batch_get_item, RequestItems=request_items)
+        for table_name, items in resp.get("Responses", {}).items():
+            responses.setdefault(table_name, []).extend(items)
+        request_items = resp.get("UnprocessedKeys") or {}
+        if not request_items:
+            break
+        # unprocessed keys are DynamoDB's way of throttling a batch
+        _bucket.on_throttle()
+        attempt += 1
+        if attempt >= MAX_ATTEMPTS:
+            break
+        try:
+            sleep_within(backoff_delay(attempt), current_deadline())
+        except DeadlineExceeded:
+            break
+    return responses, request_items
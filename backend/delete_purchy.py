@@ -1,10 +1,7 @@
-import os
 import json
-import boto3
 import traceback
-
-# CONFIG
-TABLE_NAME = os.environ.get("PURCHIES_TABLE_NAME", "Purchies")
+import purchy_cache
+import storage
 
 # CORS - during dev '*' is easiest. For production set exact origin.
 CORS_HEADERS = {
@@ -13,12 +10,12 @@ CORS_HEADERS = {
     "Access-Control-Allow-Methods": "GET,POST,DELETE,OPTIONS",
 }
 
-dynamodb = boto3.resource("dynamodb")
-table = dynamodb.Table(TABLE_NAME)
-
 
 def lambda_handler(event, context):
     try:
+        store = storage.get_store()
+        store.start_invocation(context)
+
         # Handle preflight
         if event.get("httpMethod") == "OPTIONS":
             return {"statusCode": 200, "headers": CORS_HEADERS, "body": ""}
@@ -45,16 +42,14 @@ def lambda_handler(event, context):
 
         # Attempt deletion
         try:
-            resp = table.delete_item(
-                Key={"account_id": account_id, "purchy_ts": purchy_ts},
-                ConditionExpression="attribute_exists(purchy_ts)"
-            )
-        except table.meta.client.exceptions.ConditionalCheckFailedException:
+            store.delete_purchy(account_id, purchy_ts)
+        except storage.NotFound:
             return {
                 "statusCode": 404,
                 "headers": CORS_HEADERS,
                 "body": json.dumps({"message": "Purchy not found"}),
             }
+        purchy_cache.invalidate(account_id, purchy_ts)
 
         # If delete succeeded, return 200 with optional JSON
         return {
@@ -63,6 +58,14 @@ def lambda_handler(event, context):
             "body": json.dumps({"message": "Deleted successfully"})
         }
 
+    except storage.Overloaded as e:
+        print("Store overloaded in delete_purchy:", str(e))
+        return {
+            "statusCode": 503,
+            "headers": {**CORS_HEADERS, "Retry-After": "1"},
+            "body": json.dumps({"message": "Service busy, please retry", "error": str(e)})
+        }
+
     except Exception as e:
         # Log the full stack to CloudWatch for debugging
         tb = traceback.format_exc()
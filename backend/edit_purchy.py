@@ -1,12 +1,9 @@
-import os
 import json
 import base64
 import traceback
 from decimal import Decimal
-import boto3
-
-# Config
-TABLE = os.environ.get("PURCHIES_TABLE_NAME")
+import purchy_cache
+import storage
 
 # CORS headers (use exact origin in production instead of "*")
 CORS_HEADERS = {
@@ -15,10 +12,6 @@ CORS_HEADERS = {
     "Access-Control-Allow-Methods": "GET,POST,PUT,DELETE,OPTIONS",
 }
 
-dynamodb = boto3.resource("dynamodb")
-client = boto3.client("dynamodb")
-table = dynamodb.Table(TABLE)
-
 
 # ---------- Helpers ----------
 
@@ -92,22 +85,6 @@ def decimal_to_native(obj):
     return obj
 
 
-def to_ddb_value(v):
-    """Convert a Python primitive (str, int, float, Decimal) to DynamoDB attribute value format for client.transact_write_items."""
-    if v is None:
-        return None
-    if isinstance(v, str):
-        return {"S": v}
-    if isinstance(v, bool):
-        return {"BOOL": v}
-    if isinstance(v, Decimal):
-        return {"N": str(v)}
-    if isinstance(v, (int, float)):
-        return {"N": str(v)}
-    # fallback to string
-    return {"S": str(v)}
-
-
 def api_response(status_code, body_obj=None):
     """Return API Gateway proxy integration response with CORS headers.
        body_obj will be JSON-serialized; if None, return empty body (useful for OPTIONS and some success responses)."""
@@ -118,10 +95,21 @@ def api_response(status_code, body_obj=None):
     return {"statusCode": status_code, "headers": CORS_HEADERS, "body": body}
 
 
+def busy_response(e):
+    """503 when the store stays throttled or the invocation runs out of time; the client may retry."""
+    print("Store overloaded in edit_purchy:", str(e))
+    resp = api_response(503, {"message": "Service busy, please retry", "error": str(e)})
+    resp["headers"] = {**CORS_HEADERS, "Retry-After": "1"}
+    return resp
+
+
 # ---------- Lambda handler ----------
 
 def lambda_handler(event, context):
     try:
+        store = storage.get_store()
+        store.start_invocation(context)
+
         # # Preflight (CORS)
         # if event.get("httpMethod") == "OPTIONS":
         #     return api_response(200, None)
@@ -156,8 +144,7 @@ def lambda_handler(event, context):
         weight = body.get("weight")          # numeric
 
         # Read existing item
-        get_resp = table.get_item(Key={"account_id": old_account_id, "purchy_ts": purchy_ts})
-        existing = get_resp.get("Item")
+        existing = store.get_purchy(old_account_id, purchy_ts)
         if not existing:
             return api_response(404, {"message": "Purchy not found"})
 
@@ -188,67 +175,45 @@ def lambda_handler(event, context):
                 else:
                     new_item["weight"] = wdec
 
-            # Prepare Put and Delete for TransactWriteItems
-            put_item_map = {}
-            for k, v in new_item.items():
-                # do not include None values
-                if v is None:
-                    continue
-                av = to_ddb_value(v)
-                if av is not None:
-                    put_item_map[k] = av
-
-            delete_key = {"account_id": {"S": old_account_id}, "purchy_ts": {"S": purchy_ts}}
-
+            # Put new + Delete old atomically
             try:
-                client.transact_write_items(
-                    TransactItems=[
-                        {"Put": {"TableName": TABLE, "Item": put_item_map}},
-                        {"Delete": {"TableName": TABLE, "Key": delete_key, "ConditionExpression": "attribute_exists(purchy_ts)"}}
-                    ]
-                )
-            except client.exceptions.TransactionCanceledException as e:
-                # Transaction failed; log and return error
-                print("TransactionCanceledException:", str(e))
-                return api_response(500, {"message": "Transaction cancelled", "error": str(e)})
+                store.move_purchy(old_account_id, new_item)
+            except storage.AlreadyExists:
+                # never overwrite a purchy already stored under the same key in the target account
+                return api_response(409, {"message": "Target account already has a purchy with this purchy_ts"})
+            except storage.NotFound:
+                return api_response(404, {"message": "Purchy not found"})
+            except storage.Overloaded as e:
+                return busy_response(e)
             except Exception as e:
-                print("TransactWriteItems exception:", str(e))
+                print("Move exception:", str(e))
                 traceback.print_exc()
                 return api_response(500, {"message": "Internal error during move", "error": str(e)})
 
+            purchy_cache.invalidate(old_account_id, purchy_ts)
+            purchy_cache.invalidate(new_account_id, purchy_ts)
+
             # Return the new_item (convert Decimal to native)
             return api_response(200, {"message": "Updated (moved) successfully", "item": new_item})
 
-        # --- else: account unchanged -> UpdateItem for allowed attributes ---
+        # --- else: account unchanged -> update allowed attributes in place ---
 
-        update_expressions = []
-        expr_attr_vals = {}
-        expr_attr_names = {}
+        set_fields = {}
         remove_attrs = []
-        idx = 0
-
-        def add_set(name, value):
-            nonlocal idx
-            idx += 1
-            ph_name = f"#n{idx}"
-            ph_val = f":v{idx}"
-            expr_attr_names[ph_name] = name
-            expr_attr_vals[ph_val] = value
-            update_expressions.append(f"{ph_name} = {ph_val}")
 
         # DATE
         if date is not None:
             if date == "" or date is None:
                 remove_attrs.append("date")
             else:
-                add_set("date", date)
+                set_fields["date"] = date
 
         # PURCHY_ID
         if purchy_id is not None:
             if purchy_id == "" or purchy_id is None:
                 remove_attrs.append("purchy_id")
             else:
-                add_set("purchy_id", str(purchy_id))
+                set_fields["purchy_id"] = str(purchy_id)
 
         # WEIGHT
         if weight is not None:
@@ -256,48 +221,26 @@ def lambda_handler(event, context):
             if wdec is None:
                 remove_attrs.append("weight")
             else:
-                add_set("weight", wdec)
+                set_fields["weight"] = wdec
 
-        if not update_expressions and not remove_attrs:
+        if not set_fields and not remove_attrs:
             return api_response(400, {"message": "No valid updates provided"})
 
-        set_expr = ""
-        remove_expr = ""
-        if update_expressions:
-            set_expr = "SET " + ", ".join(update_expressions)
-        if remove_attrs:
-            remove_expr = " REMOVE " + ", ".join(remove_attrs)
-
-        final_expr = (set_expr + remove_expr).strip()
-        if not final_expr:
-            return api_response(400, {"message": "No valid updates after processing"})
-
-        # build update params; DynamoDB resource expects ExpressionAttributeValues to be native Python types (Decimals allowed)
-        update_params = {
-            "Key": {"account_id": old_account_id, "purchy_ts": purchy_ts},
-            "UpdateExpression": final_expr,
-            "ConditionExpression": "attribute_exists(purchy_ts)",
-            "ReturnValues": "ALL_NEW"
-        }
-        if expr_attr_names:
-            update_params["ExpressionAttributeNames"] = expr_attr_names
-        if expr_attr_vals:
-            update_params["ExpressionAttributeValues"] = expr_attr_vals
-
-        # Remove None entries (just in case)
-        update_params = {k: v for k, v in update_params.items() if v is not None}
-
         try:
-            resp = table.update_item(**update_params)
-            new_attrs = resp.get("Attributes", {})
+            new_attrs = store.update_purchy(old_account_id, purchy_ts, set_fields, remove_attrs)
+            purchy_cache.invalidate(old_account_id, purchy_ts)
             return api_response(200, {"message": "Updated successfully", "item": new_attrs})
-        except table.meta.client.exceptions.ConditionalCheckFailedException:
+        except storage.NotFound:
             return api_response(404, {"message": "Purchy not found"})
+        except storage.Overloaded as e:
+            return busy_response(e)
         except Exception as e:
             print("UpdateItem exception:", str(e))
             traceback.print_exc()
             return api_response(500, {"message": "Internal update error", "error": str(e)})
 
+    except storage.Overloaded as e:
+        return busy_response(e)
     except Exception as e:
         print("Unhandled exception in handler:", str(e))
         traceback.print_exc()
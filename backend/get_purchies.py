@@ -2,13 +2,12 @@ import os
 import json
 import math
 from decimal import Decimal
-from boto3.dynamodb.conditions import Key, Attr
-import boto3
 from datetime import datetime, timezone
+import purchy_cache
+import storage
 
 # Config from env
-PURCHIES_TABLE = os.environ.get("PURCHIES_TABLE_NAME", "Purchies")
-ACCOUNTS_TABLE = os.environ.get("ACCOUNTS_TABLE_NAME", "Accounts")
+MAX_ACCOUNTS_PER_REQUEST = int(os.environ.get("MAX_ACCOUNTS_PER_REQUEST", "100"))
 
 # CORS (dev '*' is OK; set specific origin in production)
 CORS_HEADERS = {
@@ -17,9 +16,8 @@ CORS_HEADERS = {
     "Access-Control-Allow-Methods": "GET,POST,DELETE,OPTIONS",
 }
 
-dynamodb = boto3.resource("dynamodb")
-p_table = dynamodb.Table(PURCHIES_TABLE)
-dynamodb_client = boto3.client("dynamodb")  # for batch_get_item
+# "json" returns the items with totals, "totals" only the totals (aggregated by the store)
+FORMATS = ("json", "totals")
 
 def decimal_to_native(obj):
     if isinstance(obj, list):
@@ -30,71 +28,63 @@ def decimal_to_native(obj):
         return float(obj)
     return obj
 
-def build_response(status_code, body_obj=None):
+def build_response(status_code, body_obj=None, extra_headers=None):
     body = "" if body_obj is None else json.dumps(decimal_to_native(body_obj))
+    return build_raw_response(status_code, body, extra_headers)
+
+def build_raw_response(status_code, body, extra_headers=None):
+    """Response around an already-serialized JSON body (cache hits)."""
     return {
         "statusCode": status_code,
-        "headers": { "Content-Type": "application/json", **CORS_HEADERS },
+        "headers": { "Content-Type": "application/json", **CORS_HEADERS, **(extra_headers or {}) },
         "body": body
     }
 
-def chunk_list(lst, n):
-    """Yield successive n-sized chunks from list."""
-    for i in range(0, len(lst), n):
-        yield lst[i:i + n]
-
-def batch_get_accounts(account_ids):
-    """Return dict mapping account_id -> account_name using BatchGetItem with chunking (max 100 keys)."""
-    if not account_ids:
-        return {}
-
-    result_map = {}
-    # DynamoDB BatchGetItem limit: 100 items per request
-    for chunk in chunk_list(list(account_ids), 100):
-        keys = [{"account_id": {"S": aid}} for aid in chunk]
-        request_items = {
-            ACCOUNTS_TABLE: {
-                "Keys": keys,
-                "ProjectionExpression": "account_id, account_name"
-            }
-        }
-
-        resp = dynamodb_client.batch_get_item(RequestItems=request_items)
-        # parse returned items
-        responses = resp.get("Responses", {}).get(ACCOUNTS_TABLE, [])
-        for item in responses:
-            # item is in DynamoDB JSON format, convert safely
-            aid = item.get("account_id", {}).get("S")
-            aname = item.get("account_name", {}).get("S") if item.get("account_name") else None
-            if aid:
-                result_map[aid] = aname
-
-        # handle UnprocessedKeys (retry simple backoff)
-        unprocessed = resp.get("UnprocessedKeys", {})
-        retries = 0
-        while unprocessed and retries < 3:
-            resp2 = dynamodb_client.batch_get_item(RequestItems=unprocessed)
-            responses2 = resp2.get("Responses", {}).get(ACCOUNTS_TABLE, [])
-            for item in responses2:
-                aid = item.get("account_id", {}).get("S")
-                aname = item.get("account_name", {}).get("S") if item.get("account_name") else None
-                if aid:
-                    result_map[aid] = aname
-            unprocessed = resp2.get("UnprocessedKeys", {})
-            retries += 1
-
-    return result_map
+def parse_account_ids(raw):
+    """
+    Split 'id1,id2,...' into unique ids (order kept). Returns None for ALL.
+    Raises ValueError when ALL is mixed with ids or a non-empty value has no ids
+    (e.g. ',' or ' , '); either would otherwise silently become a full Scan.
+    """
+    ids = []
+    wants_all = False
+    for aid in (raw or "").split(","):
+        aid = aid.strip()
+        if not aid:
+            continue
+        if aid.upper() == "ALL":
+            wants_all = True
+        elif aid not in ids:
+            ids.append(aid)
+    if wants_all and ids:
+        raise ValueError("account_id=ALL cannot be combined with account ids")
+    if not ids and not wants_all and raw:
+        raise ValueError("account_id has no account ids")
+    return ids or None
 
 def lambda_handler(event, context):
     try:
+        store = storage.get_store()
+        store.start_invocation(context)
+
         # Preflight support
         if event.get("httpMethod") == "OPTIONS":
             return build_response(200, None)
 
         params = event.get("queryStringParameters") or {}
-        account_id = (params.get("account_id") or "ALL").strip()
+        account_id = params.get("account_id") or "ALL"
+        try:
+            account_ids = parse_account_ids(account_id)  # None -> ALL
+        except ValueError as e:
+            return build_response(400, {"message": str(e)})
         from_date = params.get("from")  # 'YYYY-MM-DD' or None
         to_date = params.get("to")      # 'YYYY-MM-DD' or None
+        fmt = (params.get("format") or "json").strip().lower()
+
+        if fmt not in FORMATS:
+            return build_response(400, {"message": f"Unsupported format: {fmt}"})
+        if account_ids and len(account_ids) > MAX_ACCOUNTS_PER_REQUEST:
+            return build_response(400, {"message": f"At most {MAX_ACCOUNTS_PER_REQUEST} account_ids per request"})
 
         # Build purchy_ts bounds (simple YYYY-MM-DD -> start/end of day)
         if from_date:
@@ -107,43 +97,52 @@ def lambda_handler(event, context):
         else:
             to_ts = "9999-12-31T23:59:59Z"
 
-        items = []
-
-        # Query or Scan
-        if account_id and account_id.upper() != "ALL":
-            resp = p_table.query(
-                KeyConditionExpression=Key("account_id").eq(account_id) & Key("purchy_ts").between(from_ts, to_ts),
-                ScanIndexForward=False
-            )
-            items.extend(resp.get("Items", []))
-            while "LastEvaluatedKey" in resp:
-                resp = p_table.query(
-                    KeyConditionExpression=Key("account_id").eq(account_id) & Key("purchy_ts").between(from_ts, to_ts),
-                    ExclusiveStartKey=resp["LastEvaluatedKey"],
-                    ScanIndexForward=False
-                )
-                items.extend(resp.get("Items", []))
+        # Serve repeated views from the cache without touching the table
+        if account_ids is None:
+            scope = purchy_cache.ALL_SCOPE
+        elif len(account_ids) == 1:
+            scope = account_ids[0]
         else:
-            resp = p_table.scan(
-                FilterExpression=Attr("purchy_ts").between(from_ts, to_ts)
-            )
-            items.extend(resp.get("Items", []))
-            while "LastEvaluatedKey" in resp:
-                resp = p_table.scan(
-                    FilterExpression=Attr("purchy_ts").between(from_ts, to_ts),
-                    ExclusiveStartKey=resp["LastEvaluatedKey"]
-                )
-                items.extend(resp.get("Items", []))
-
-        # Collect unique account_ids from items
-        account_ids = set()
-        for it in items:
-            aid = it.get("account_id")
-            if aid:
-                account_ids.add(aid)
+            scope = sorted(account_ids)
+        cached_body, cache_token = purchy_cache.lookup(scope, from_ts, to_ts, fmt)
+        if cached_body is not None:
+            return build_raw_response(200, cached_body, {"X-Cache": "HIT"})
+        # A result cached under the current generations must include every write that
+        # bumped them; an eventually consistent read could miss one and pin it for the TTL
+        consistent = cache_token is not None
+
+        if fmt == "totals":
+            totals, partial = store.purchy_totals(account_ids, from_ts, to_ts, consistent)
+            if partial and not totals["count"]:
+                return build_response(503, {"message": "Service busy, please retry"}, {"Retry-After": "1"})
+            if partial:
+                totals["partial"] = True
+            body = json.dumps(decimal_to_native(totals))
+            if not partial:
+                purchy_cache.store(scope, from_ts, to_ts, fmt, body, cache_token)
+            return build_raw_response(200, body, {"X-Cache": "MISS"})
+
+        # Query (one or more accounts, newest first) or Scan. Under sustained throttling
+        # these return what they managed to read and partial=True instead of failing.
+        if account_ids:
+            # may be a lazy k-way merge: totals below are computed while it runs
+            items, partial = store.query_purchies(account_ids, from_ts, to_ts, consistent)
+        else:
+            items, partial = store.scan_purchies(from_ts, to_ts, consistent)
+
+        # Collect unique account_ids from items (known up front for a list of accounts)
+        if account_ids and len(account_ids) > 1:
+            name_ids = set(account_ids)
+        else:
+            name_ids = set()
+            for it in items:
+                aid = it.get("account_id")
+                if aid:
+                    name_ids.add(aid)
 
         # Batch-get account names from Accounts table
-        account_map = batch_get_accounts(account_ids)  # returns {account_id: account_name}
+        account_map, names_partial = store.get_account_names(name_ids)  # returns {account_id: account_name}
+        partial = partial or names_partial
 
         # Compute totals and merge account_name into items
         total_weight = Decimal("0")
@@ -213,14 +212,24 @@ def lambda_handler(event, context):
 
             merged_items.append(merged)
 
+        if partial and not merged_items:
+            return build_response(503, {"message": "Service busy, please retry"}, {"Retry-After": "1"})
+
         response_body = {
             "count": len(merged_items),
             "total_weight": total_weight,
             "total_amount": total_amount,
             "items": merged_items
         }
+        if partial:
+            # totals only cover the items returned; the client can retry for the full view
+            response_body["partial"] = True
+
+        body = json.dumps(decimal_to_native(response_body))
+        if not partial:
+            purchy_cache.store(scope, from_ts, to_ts, fmt, body, cache_token)
 
-        return build_response(200, response_body)
+        return build_raw_response(200, body, {"X-Cache": "MISS"})
 
     except Exception as e:
         # log and return 500
@@ -1,25 +1,31 @@
 import json
-import boto3
-import os
+import storage
 
 
-dynamodb = boto3.resource('dynamodb')
-table_name = os.environ.get('ACCOUNTS_TABLE_NAME', 'Accounts')
-accounts_table = dynamodb.Table(table_name)
-
 def lambda_handler(event, context):
     try:
+        store = storage.get_store()
+        store.start_invocation(context)
         print("Event:",json.dumps(event))
 
-        response = accounts_table.scan()
-        items = response.get('Items', [])
+        # under sustained throttling the store returns the accounts read so far
+        items, partial = store.list_accounts()
+        if partial and not items:
+            return {
+                'statusCode': 503,
+                'headers': {'Content-Type': 'application/json',"Access-Control-Allow-Origin":"*","Retry-After":"1"},
+                'body': json.dumps({'error': 'Service busy, please retry'})
+            }
 
         active_accounts = [{"account_id": item.get("account_id"),"account_name": item.get("account_name")} for item in items if item.get("is_active", False)]
 
         active_accounts.sort(key=lambda x: x["account_name"].lower())
+        headers = {'Content-Type': 'application/json',"Access-Control-Allow-Origin":"*"}
+        if partial:
+            headers["X-Partial-Result"] = "true"
         return {
             'statusCode': 200,
-            'headers': {'Content-Type': 'application/json',"Access-Control-Allow-Origin":"*"},
+            'headers': headers,
             'body': json.dumps(active_accounts)
         }
     except Exception as e:
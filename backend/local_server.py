@@ -0,0 +1,113 @@
+"""
+Run the Lambda handlers behind a small local HTTP server, e.g. on a weighbridge
+laptop without connectivity (SQLite) or for local testing:
+
+    python local_server.py --port 8000 --db sugarcane.db
+
+Then point the frontend at it with VITE_API_BASE_URL=http://localhost:8000.
+Requests are turned into API Gateway proxy events, so the handlers run unchanged.
+"""
+import os
+import json
+import time
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl
+
+# Default to the embedded store; must be set before the handlers import storage.
+# All handlers share this process, so the in-process cache tier sees every write.
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("PURCHY_CACHE_SHARED", "local")
+
+import storage
+import add_account
+import list_accounts
+import add_purchy
+import get_purchies
+import edit_purchy
+import delete_purchy
+
+ROUTES = {
+    ("/accounts", "GET"): list_accounts.lambda_handler,
+    ("/accounts", "POST"): add_account.lambda_handler,
+    ("/purchies", "GET"): get_purchies.lambda_handler,
+    ("/purchies", "POST"): add_purchy.lambda_handler,
+    ("/purchies", "PUT"): edit_purchy.lambda_handler,
+    ("/purchies", "DELETE"): delete_purchy.lambda_handler,
+}
+
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Headers": "Content-Type,Authorization",
+    "Access-Control-Allow-Methods": "GET,POST,PUT,DELETE,OPTIONS",
+}
+
+LAMBDA_TIMEOUT_MS = 30000
+
+
+class LocalContext:
+    """The bits of the Lambda context object the handlers use."""
+
+    def __init__(self, timeout_ms=LAMBDA_TIMEOUT_MS):
+        self.deadline = time.monotonic() + timeout_ms / 1000
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self.deadline - time.monotonic()) * 1000))
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    def _dispatch(self):
+        url = urlsplit(self.path)
+        path = url.path.rstrip("/") or "/"
+        method = self.command
+
+        if method == "OPTIONS":
+            return self._send({"statusCode": 200, "headers": CORS_HEADERS, "body": ""})
+
+        handler = ROUTES.get((path, method))
+        if handler is None:
+            return self._send({"statusCode": 404, "headers": CORS_HEADERS, "body": json.dumps({"message": "Not found"})})
+
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode("utf-8") if length else None
+        event = {
+            "httpMethod": method,
+            "path": path,
+            "headers": dict(self.headers),
+            "queryStringParameters": dict(parse_qsl(url.query)) or None,
+            "body": body,
+            "isBase64Encoded": False,
+        }
+        self._send(handler(event, LocalContext()))
+
+    def _send(self, resp):
+        body = (resp.get("body") or "").encode("utf-8")
+        self.send_response(resp.get("statusCode", 200))
+        for k, v in {**CORS_HEADERS, **(resp.get("headers") or {})}.items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_OPTIONS = _dispatch
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the sugarcane tracker API locally")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--db", help="SQLite file (default: SQLITE_PATH or sugarcane.db)")
+    args = parser.parse_args()
+
+    if args.db and os.environ["STORAGE_BACKEND"] == "sqlite":
+        from storage_sqlite import SQLiteStore
+        storage.set_store(SQLiteStore(args.db))
+
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    print(f"Serving {os.environ['STORAGE_BACKEND']} store on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+One-off migration: rewrite legacy second-precision purchy_ts keys
+('2025-01-10T08:30:10+05:30') to the suffixed format from purchy_keys
+('2025-01-10T08:30:10.000000+05:30#0000000000').
+
+Each row is moved with a TransactWriteItems Put + Delete, so a row is never
+lost or duplicated. The new key is deterministic, which makes the script safe
+to re-run. The old key is kept on the row as `legacy_purchy_ts`.
+
+Usage:
+    python migrate_purchy_ts.py            # dry run, prints what would change
+    python migrate_purchy_ts.py --apply
+"""
+import os
+import uuid
+import argparse
+import traceback
+import boto3
+from boto3.dynamodb.types import TypeSerializer
+
+import purchy_keys
+import ddb_resilience
+
+TABLE = os.environ.get("PURCHIES_TABLE_NAME", "Purchies")
+
+dynamodb = boto3.resource("dynamodb", config=ddb_resilience.BOTO_CONFIG)
+client = boto3.client("dynamodb", config=ddb_resilience.BOTO_CONFIG)
+table = dynamodb.Table(TABLE)
+serializer = TypeSerializer()
+
+
+def legacy_items():
+    """Yield every row whose purchy_ts has no uniqueness suffix."""
+    resp = ddb_resilience.call(table.scan)
+    while True:
+        for item in resp.get("Items", []):
+            if purchy_keys.is_legacy_key(item.get("purchy_ts", "")):
+                yield item
+        if "LastEvaluatedKey" not in resp:
+            break
+        resp = ddb_resilience.call(table.scan, ExclusiveStartKey=resp["LastEvaluatedKey"])
+
+
+def migrate_item(item):
+    """Move one row to its new key. Returns the new purchy_ts."""
+    old_ts = item["purchy_ts"]
+    new_ts = purchy_keys.migrated_key(old_ts)
+
+    new_item = dict(item)
+    new_item["purchy_ts"] = new_ts
+    new_item["legacy_purchy_ts"] = old_ts
+
+    ddb_resilience.call(
+        client.transact_write_items,
+        TransactItems=[
+            {"Put": {
+                "TableName": TABLE,
+                "Item": {k: serializer.serialize(v) for k, v in new_item.items()},
+                "ConditionExpression": "attribute_not_exists(purchy_ts)"
+            }},
+            {"Delete": {
+                "TableName": TABLE,
+                "Key": {"account_id": {"S": item["account_id"]}, "purchy_ts": {"S": old_ts}},
+                "ConditionExpression": "attribute_exists(purchy_ts)"
+            }}
+        ],
+        ClientRequestToken=str(uuid.uuid4())
+    )
+    return new_ts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate legacy purchy_ts keys")
+    parser.add_argument("--apply", action="store_true", help="write changes (default is a dry run)")
+    args = parser.parse_args()
+
+    migrated = failed = 0
+    for item in legacy_items():
+        old_ts = item["purchy_ts"]
+        if not args.apply:
+            print(f"{item['account_id']} {old_ts} -> {purchy_keys.migrated_key(old_ts)}")
+            migrated += 1
+            continue
+        try:
+            new_ts = migrate_item(item)
+            print(f"{item['account_id']} {old_ts} -> {new_ts}")
+            migrated += 1
+        except Exception as e:
+            print(f"Failed {item['account_id']} {old_ts}:", str(e))
+            traceback.print_exc()
+            failed += 1
+
+    action = "Migrated" if args.apply else "Would migrate"
+    print(f"{action} {migrated} rows, {failed} failed")
+
+
+if __name__ == "__main__":
+    main()
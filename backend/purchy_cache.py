@@ -0,0 +1,321 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+# Config from env
+CACHE_TTL_SECONDS = int(os.environ.get("PURCHY_CACHE_TTL", "60"))        # 0 disables caching
+CACHE_MAX_ENTRIES = int(os.environ.get("PURCHY_CACHE_MAX_ENTRIES", "128"))
+# "" (cache off), "dynamodb" (deployed Lambdas) or "local" (single process, e.g. local_server.py).
+# The write Lambdas run in other containers, so without a shared tier they could
+# not invalidate anything; the cache is only enabled when one is configured.
+SHARED_CACHE_BACKEND = os.environ.get("PURCHY_CACHE_SHARED", "")
+CACHE_TABLE_NAME = os.environ.get("PURCHY_CACHE_TABLE_NAME", "PurchyCache")
+
+# Scope used for account_id=ALL views; every write also invalidates it
+ALL_SCOPE = "ALL"
+
+
+# ---------- Helpers ----------
+
+def scopes_of(scope):
+    """A view covers one scope (account_id or ALL) or a list of account_ids."""
+    if isinstance(scope, (list, tuple)):
+        return tuple(sorted(scope))
+    return (scope,)
+
+
+def cache_key(scope, from_ts, to_ts, fmt):
+    """Key for one get_purchies view: (account_id, from, to, format)."""
+    return f"purchies|{','.join(scopes_of(scope))}|{from_ts}|{to_ts}|{fmt}"
+
+
+def bucket_of(purchy_ts):
+    """Date bucket ('YYYY-MM') a purchy_ts falls into."""
+    return str(purchy_ts)[:7]
+
+
+def in_range(purchy_ts, from_ts, to_ts):
+    """Same string comparison the table uses for the purchy_ts BETWEEN condition."""
+    return from_ts <= purchy_ts <= to_ts
+
+
+# ---------- Tiers ----------
+
+class LRUCache:
+    """
+    Warm-container tier: a bounded LRU with a TTL per entry.
+    Each entry remembers the scopes and purchy_ts range it covers so writes
+    made in this process can drop exactly the views they affect.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (body, token) for a live entry, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry["expires_at"] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry["body"], entry["token"]
+
+    def set(self, key, body, token, scope, from_ts, to_ts):
+        with self._lock:
+            self._entries[key] = {
+                "body": body,
+                "token": token,
+                "scopes": scopes_of(scope),
+                "from_ts": from_ts,
+                "to_ts": to_ts,
+                "expires_at": time.time() + self.ttl,
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, scope, purchy_ts):
+        """Drop entries of `scope` whose range contains purchy_ts."""
+        with self._lock:
+            stale = [
+                k for k, e in self._entries.items()
+                if scope in e["scopes"] and in_range(purchy_ts, e["from_ts"], e["to_ts"])
+            ]
+            for k in stale:
+                del self._entries[k]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SharedCache:
+    """
+    Interface for the optional shared tier (e.g. ElastiCache/Redis, a DynamoDB cache table).
+
+    Besides plain get/set with a TTL, a shared tier keeps a generation counter per
+    (scope, date bucket). Writers bump the counters for the buckets they touch and
+    readers fold the counters covering their range into a token, so a cached view
+    is only served while no write has landed in its range.
+    bump() must be atomic across containers (HINCRBY, ADD in an UpdateItem, ...).
+    """
+
+    def get(self, key):
+        """Return the stored value or None."""
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def generations(self, scopes):
+        """Return {scope: {bucket: generation}} for every bucket ever bumped in each scope (one round trip)."""
+        raise NotImplementedError
+
+    def bump(self, scope, bucket):
+        raise NotImplementedError
+
+
+class LocalSharedCache(SharedCache):
+    """In-process stand-in for a shared tier (local runs and testing)."""
+
+    def __init__(self):
+        self._values = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._values.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= time.time():
+                del self._values[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._values[key] = (value, time.time() + ttl)
+
+    def generations(self, scopes):
+        with self._lock:
+            return {s: dict(self._generations.get(s, {})) for s in scopes}
+
+    def bump(self, scope, bucket):
+        with self._lock:
+            gens = self._generations.setdefault(scope, {})
+            gens[bucket] = gens.get(bucket, 0) + 1
+
+
+class DynamoDBSharedCache(SharedCache):
+    """
+    Shared tier in a DynamoDB table (partition key `pk`, TTL attribute `expires_at`).
+    Generations live in one item per scope with one numeric attribute per bucket,
+    bumped atomically with ADD so writers in any container invalidate readers.
+    Calls go through ddb_resilience like every other DynamoDB call.
+    """
+
+    GEN_PREFIX = "g_"
+    BATCH_GET_LIMIT = 100
+
+    def __init__(self, table_name=CACHE_TABLE_NAME):
+        # imported here so SQLite-only setups (local_server.py) need no AWS SDK
+        import boto3
+        import ddb_resilience
+        self.resilience = ddb_resilience
+        self.table_name = table_name
+        self.client = boto3.client("dynamodb", config=ddb_resilience.BOTO_CONFIG)
+
+    def get(self, key):
+        resp = self.resilience.call(self.client.get_item, TableName=self.table_name, Key={"pk": {"S": f"val|{key}"}})
+        item = resp.get("Item")
+        if not item or int(item.get("expires_at", {}).get("N", 0)) <= time.time():
+            return None
+        return json.loads(item["value"]["S"])
+
+    def set(self, key, value, ttl):
+        self.resilience.call(self.client.put_item, TableName=self.table_name, Item={
+            "pk": {"S": f"val|{key}"},
+            "value": {"S": json.dumps(value)},
+            "expires_at": {"N": str(int(time.time() + ttl))},
+        })
+
+    def generations(self, scopes):
+        """One consistent BatchGetItem for all scopes (chunked at 100 keys)."""
+        scopes = list(scopes)
+        result = {s: {} for s in scopes}
+        for i in range(0, len(scopes), self.BATCH_GET_LIMIT):
+            chunk = scopes[i:i + self.BATCH_GET_LIMIT]
+            request_items = {self.table_name: {
+                "Keys": [{"pk": {"S": f"gen|{s}"}} for s in chunk],
+                "ConsistentRead": True,
+            }}
+            responses, unprocessed = self.resilience.batch_get_item(self.client, request_items)
+            if unprocessed:
+                # a token missing some generations could match a stale entry
+                raise self.resilience.ThrottledError("cache generations unavailable")
+            for item in responses.get(self.table_name, []):
+                scope = item["pk"]["S"][len("gen|"):]
+                result[scope] = {
+                    k[len(self.GEN_PREFIX):]: int(v["N"])
+                    for k, v in item.items() if k.startswith(self.GEN_PREFIX)
+                }
+        return result
+
+    def bump(self, scope, bucket):
+        self.resilience.call(
+            self.client.update_item,
+            TableName=self.table_name,
+            Key={"pk": {"S": f"gen|{scope}"}},
+            UpdateExpression="ADD #b :one",
+            ExpressionAttributeNames={"#b": f"{self.GEN_PREFIX}{bucket}"},
+            ExpressionAttributeValues={":one": {"N": "1"}},
+        )
+
+
+def _shared_from_env():
+    if SHARED_CACHE_BACKEND == "local":
+        return LocalSharedCache()
+    if SHARED_CACHE_BACKEND == "dynamodb":
+        return DynamoDBSharedCache()
+    return None
+
+
+_lru = LRUCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+_shared = _shared_from_env()
+
+
+def set_shared_cache(backend):
+    """Plug in a SharedCache implementation (None turns the cache off)."""
+    global _shared
+    _shared = backend
+    _lru.clear()
+
+
+def enabled():
+    return CACHE_TTL_SECONDS > 0 and _shared is not None
+
+
+def _token(scope, from_ts, to_ts):
+    """Generations of the buckets overlapping [from_ts, to_ts] in each scope of the view."""
+    lo, hi = bucket_of(from_ts), bucket_of(to_ts)
+    scopes = scopes_of(scope)
+    gens_by_scope = _shared.generations(scopes)
+    token = []
+    for s in scopes:
+        gens = gens_by_scope.get(s, {})
+        token.extend(sorted([s, b, g] for b, g in gens.items() if lo <= b <= hi))
+    return token
+
+
+# ---------- Public API ----------
+
+def lookup(scope, from_ts, to_ts, fmt="json"):
+    """
+    Look up a cached get_purchies body.
+    Returns (body_or_None, token); pass the token back to store() after a miss.
+    The token is taken before the table is read so a write racing the query
+    invalidates the entry stored afterwards.
+    """
+    if not enabled():
+        return None, None
+
+    key = cache_key(scope, from_ts, to_ts, fmt)
+    try:
+        token = _token(scope, from_ts, to_ts)
+
+        hit = _lru.get(key)
+        if hit is not None and hit[1] == token:
+            return hit[0], token
+
+        value = _shared.get(key)
+        if value is not None and value.get("token") == token:
+            _lru.set(key, value["body"], token, scope, from_ts, to_ts)
+            return value["body"], token
+    except Exception as e:
+        # a broken cache only costs a table read
+        print("Cache lookup failed:", str(e))
+        return None, None
+
+    return None, token
+
+
+def store(scope, from_ts, to_ts, fmt, body, token):
+    """Store a freshly computed body in both tiers."""
+    if not enabled() or token is None:
+        return
+
+    key = cache_key(scope, from_ts, to_ts, fmt)
+    try:
+        _lru.set(key, body, token, scope, from_ts, to_ts)
+        _shared.set(key, {"token": token, "body": body}, CACHE_TTL_SECONDS)
+    except Exception as e:
+        print("Cache store failed:", str(e))
+
+
+def invalidate(account_id, purchy_ts):
+    """
+    Called by the write Lambdas after a purchy is added, edited or deleted.
+    Bumping the shared generations reaches every container; the LRU here is
+    dropped as well for single-process setups.
+    """
+    if not account_id or not purchy_ts:
+        return
+    for scope in (account_id, ALL_SCOPE):
+        _lru.invalidate(scope, purchy_ts)
+        if _shared is None:
+            continue
+        try:
+            _shared.bump(scope, bucket_of(purchy_ts))
+        except Exception as e:
+            # already retried with backoff; never fail the write over it, TTL bounds staleness
+            print(f"Cache invalidation failed for {scope} {bucket_of(purchy_ts)}:", str(e))
@@ -0,0 +1,67 @@
+import secrets
+import threading
+from datetime import datetime, timezone, timedelta
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+# Separates the timestamp from the uniqueness suffix. Legacy keys have no suffix.
+KEY_SEPARATOR = "#"
+
+# Fixed width keeps keys lexicographically ordered; on overflow the timestamp moves on
+SEQ_WIDTH = 4
+SEQ_MAX = 16 ** SEQ_WIDTH - 1
+
+_lock = threading.Lock()
+_last_dt = None
+_seq = 0
+
+
+def new_purchy_ts(now=None):
+    """
+    Monotonic, collision-free sort key for a new purchy, e.g.
+    '2025-01-10T08:30:10.123456+05:30#0000a3f91c'.
+
+    The ISO prefix keeps keys compatible with the legacy second-precision ones
+    ('2025-01-10T08:30:10+05:30'): they still sort by time, fall inside the same
+    from/to day bounds in get_purchies and share the same month bucket.
+    Within a container a fixed-width sequence number orders keys issued in the
+    same microsecond; when it runs out the timestamp advances by one microsecond.
+    The random tail keeps containers apart. Writers must still put with
+    attribute_not_exists(purchy_ts) and retry on a clash.
+
+    Keys never go backwards within a container: if the clock (or `now`) is
+    earlier than the last key issued, the last key's timestamp is reused.
+    """
+    global _last_dt, _seq
+    dt = (now or datetime.now(IST)).astimezone(IST)
+    with _lock:
+        if _last_dt is not None and dt <= _last_dt:
+            # clock did not move (or went back): stay on the last timestamp, bump sequence
+            dt = _last_dt
+            _seq += 1
+            if _seq > SEQ_MAX:
+                dt = dt + timedelta(microseconds=1)
+                _seq = 0
+        else:
+            _seq = 0
+        _last_dt = dt
+        seq = _seq
+    ts = dt.isoformat(timespec="microseconds")
+    return f"{ts}{KEY_SEPARATOR}{seq:0{SEQ_WIDTH}x}{secrets.token_hex(3)}"
+
+
+def is_legacy_key(purchy_ts):
+    """True for keys written before sort keys got a uniqueness suffix."""
+    return KEY_SEPARATOR not in str(purchy_ts)
+
+
+def migrated_key(legacy_ts):
+    """
+    Deterministic new-style key for a legacy row. Legacy keys are unique per
+    account already, so a zero suffix is collision-free and re-running a
+    migration produces the same key.
+    """
+    dt = datetime.fromisoformat(str(legacy_ts).replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=IST)
+    return f"{dt.isoformat(timespec='microseconds')}{KEY_SEPARATOR}0000000000"
@@ -0,0 +1,163 @@
+import os
+import heapq
+from decimal import Decimal
+
+# Config from env
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "dynamodb")  # "dynamodb" or "sqlite"
+
+
+class StoreError(Exception):
+    """Base class for errors raised by a PurchyStore."""
+
+
+class NotFound(StoreError):
+    """The purchy/account to update or delete does not exist."""
+
+
+class AlreadyExists(StoreError):
+    """A conditional put found a row under the same key."""
+
+
+class Overloaded(StoreError):
+    """The backend kept throttling or the invocation ran out of time."""
+
+
+class PurchyStore:
+    """
+    Storage used by the Lambda handlers for accounts and purchies.
+
+    Items are plain dicts with Decimal numbers, the same shape the handlers got
+    from the DynamoDB resource API. Reads return (result, partial): partial is
+    True when a backend under load could only return part of the result.
+    """
+
+    def start_invocation(self, context):
+        """Called at the top of every lambda_handler (deadline tracking etc.)."""
+
+    # ----- accounts -----
+
+    def put_account(self, item):
+        raise NotImplementedError
+
+    def list_accounts(self):
+        """Return (all account items, partial)."""
+        raise NotImplementedError
+
+    def get_account_names(self, account_ids):
+        """Return ({account_id: account_name}, partial)."""
+        raise NotImplementedError
+
+    # ----- purchies -----
+
+    def get_purchy(self, account_id, purchy_ts):
+        """Return the item or None."""
+        raise NotImplementedError
+
+    def put_purchy(self, item):
+        """Insert a new purchy; raises AlreadyExists instead of overwriting."""
+        raise NotImplementedError
+
+    def update_purchy(self, account_id, purchy_ts, set_fields, remove_fields):
+        """Apply updates to an existing purchy and return the new item; raises NotFound."""
+        raise NotImplementedError
+
+    def move_purchy(self, old_account_id, new_item):
+        """
+        Atomically write new_item (new account_id, same purchy_ts) and delete the old row.
+        Raises AlreadyExists if the target key is taken, NotFound if the old row is gone.
+        """
+        raise NotImplementedError
+
+    def delete_purchy(self, account_id, purchy_ts):
+        """Raises NotFound if there is nothing to delete."""
+        raise NotImplementedError
+
+    def query_purchies(self, account_ids, from_ts, to_ts, consistent=False):
+        """
+        Return (purchy_ts-descending iterable over the given accounts, partial).
+        consistent=True must see every write that completed before the call
+        (needed when the result is cached under the current generations).
+        """
+        raise NotImplementedError
+
+    def scan_purchies(self, from_ts, to_ts, consistent=False):
+        """Return (items of every account in range, unsorted, partial)."""
+        raise NotImplementedError
+
+    def purchy_totals(self, account_ids, from_ts, to_ts, consistent=False):
+        """
+        Return ({"count", "total_weight", "total_amount"}, partial) for the given
+        accounts (None = all) without materialising the items.
+        """
+        raise NotImplementedError
+
+
+def item_amount(item):
+    """amount if stored, else weight * rate (None when neither is available)."""
+    weight = to_decimal(item.get("weight"))
+    rate = to_decimal(item.get("rate"))
+    amount = to_decimal(item.get("amount"))
+    if amount is None and weight is not None and rate is not None:
+        amount = weight * rate
+    return amount
+
+
+def merge_newest_first(streams):
+    """k-way merge of purchy_ts-descending streams (one per account) into one purchy_ts-descending iterable."""
+    if len(streams) == 1:
+        return streams[0]
+    return heapq.merge(*streams, key=lambda it: it.get("purchy_ts", ""), reverse=True)
+
+
+def sum_totals(items):
+    """{"count", "total_weight", "total_amount"} over items, added up exactly as Decimal."""
+    count = 0
+    total_weight = Decimal("0")
+    total_amount = Decimal("0")
+    for it in items:
+        count += 1
+        weight = to_decimal(it.get("weight"))
+        amount = item_amount(it)
+        if weight is not None:
+            total_weight += weight
+        if amount is not None:
+            total_amount += amount
+    return {"count": count, "total_weight": total_weight, "total_amount": total_amount}
+
+
+def to_decimal(value):
+    """Convert numeric value (str/int/float) to Decimal or return None if invalid/empty."""
+    if value is None or value == "" or isinstance(value, bool):
+        return None
+    try:
+        if isinstance(value, Decimal):
+            return value
+        if isinstance(value, (int, float, str)):
+            return Decimal(str(value))
+    except Exception:
+        return None
+    return None
+
+
+_store = None
+
+
+def get_store():
+    """The process-wide store selected by STORAGE_BACKEND (created on first use)."""
+    global _store
+    if _store is None:
+        if STORAGE_BACKEND == "sqlite":
+            from storage_sqlite import SQLiteStore
+            _store = SQLiteStore()
+        elif STORAGE_BACKEND == "dynamodb":
+            from storage_dynamodb import DynamoDBStore
+            _store = DynamoDBStore()
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+    return _store
+
+
+def set_store(store):
+    """Plug in a store explicitly (local server, sync scripts)."""
+    global _store
+    _store = store
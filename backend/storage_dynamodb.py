@@ -0,0 +1,308 @@
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import boto3
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+import ddb_resilience
+from storage import PurchyStore, NotFound, AlreadyExists, Overloaded, sum_totals, merge_newest_first
+
+# Config from env
+PURCHIES_TABLE = os.environ.get("PURCHIES_TABLE_NAME", "Purchies")
+ACCOUNTS_TABLE = os.environ.get("ACCOUNTS_TABLE_NAME", "Accounts")
+MAX_QUERY_WORKERS = int(os.environ.get("MAX_QUERY_WORKERS", "8"))
+
+# Purchy attributes compared when sync_purchy checks a row is unchanged upstream
+SYNCED_FIELDS = ("purchy_id", "date", "purchy_date", "weight", "rate", "amount", "note")
+
+deserializer = TypeDeserializer()
+serializer = TypeSerializer()
+
+
+def chunk_list(lst, n):
+    """Yield successive n-sized chunks from list."""
+    for i in range(0, len(lst), n):
+        yield lst[i:i + n]
+
+
+def from_ddb(item):
+    return {k: deserializer.deserialize(v) for k, v in item.items()}
+
+
+def to_ddb(item):
+    """Serialize an item for the low-level client, skipping None values."""
+    return {k: serializer.serialize(v) for k, v in item.items() if v is not None}
+
+
+def unchanged_condition(expected):
+    """ConditionExpression (+ names, values) matching a purchy row equal to `expected`."""
+    names, values, parts = {}, {}, ["attribute_exists(purchy_ts)"]
+    for i, field in enumerate(sorted(set(expected) | set(SYNCED_FIELDS))):
+        if field in ("account_id", "purchy_ts"):
+            continue
+        names[f"#f{i}"] = field
+        if expected.get(field) is None:
+            parts.append(f"attribute_not_exists(#f{i})")
+        else:
+            values[f":v{i}"] = expected[field]
+            parts.append(f"#f{i} = :v{i}")
+    return " AND ".join(parts), names, values
+
+
+class DynamoDBStore(PurchyStore):
+    """
+    Accounts and Purchies tables in DynamoDB. Every call goes through
+    ddb_resilience; reads degrade to partial results, writes raise Overloaded.
+    """
+
+    def __init__(self):
+        dynamodb = boto3.resource("dynamodb", config=ddb_resilience.BOTO_CONFIG)
+        self.accounts_table = dynamodb.Table(ACCOUNTS_TABLE)
+        self.purchies_table = dynamodb.Table(PURCHIES_TABLE)
+        # low-level client for batch/transact calls and threaded queries (clients are thread-safe, resources are not)
+        self.client = boto3.client("dynamodb", config=ddb_resilience.BOTO_CONFIG)
+
+    def start_invocation(self, context):
+        ddb_resilience.start_invocation(context)
+
+    def _call(self, fn, **kwargs):
+        """Single call; overload surfaces as storage.Overloaded."""
+        try:
+            return ddb_resilience.call(fn, **kwargs)
+        except ddb_resilience.OVERLOAD_ERRORS as e:
+            raise Overloaded(str(e)) from e
+
+    def _pages(self, fn, params, label):
+        """Follow LastEvaluatedKey; returns (items, partial) keeping what was read on overload."""
+        items = []
+        try:
+            while True:
+                resp = ddb_resilience.call(fn, **params)
+                items.extend(resp.get("Items", []))
+                if "LastEvaluatedKey" not in resp:
+                    return items, False
+                params["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+        except ddb_resilience.OVERLOAD_ERRORS as e:
+            print(f"Partial {label}:", str(e))
+            return items, True
+
+    # ----- accounts -----
+
+    def put_account(self, item, only_new=False):
+        """only_new leaves an existing account untouched (used by sync_upstream.py)."""
+        if not only_new:
+            self._call(self.accounts_table.put_item, Item=item)
+            return
+        try:
+            self._call(self.accounts_table.put_item, Item=item, ConditionExpression="attribute_not_exists(account_id)")
+        except self.accounts_table.meta.client.exceptions.ConditionalCheckFailedException:
+            pass
+
+    def list_accounts(self):
+        return self._pages(self.accounts_table.scan, {}, "accounts scan")
+
+    def get_account_names(self, account_ids):
+        """BatchGetItem with chunking (max 100 keys); UnprocessedKeys are retried with backoff."""
+        result_map = {}
+        partial = False
+        for chunk in chunk_list(list(account_ids), 100):
+            request_items = {
+                ACCOUNTS_TABLE: {
+                    "Keys": [{"account_id": {"S": aid}} for aid in chunk],
+                    "ProjectionExpression": "account_id, account_name"
+                }
+            }
+            try:
+                responses, unprocessed = ddb_resilience.batch_get_item(self.client, request_items)
+            except ddb_resilience.OVERLOAD_ERRORS as e:
+                print("Account names unavailable:", str(e))
+                return result_map, True
+            if unprocessed:
+                partial = True
+            for item in responses.get(ACCOUNTS_TABLE, []):
+                item = from_ddb(item)
+                if item.get("account_id"):
+                    result_map[item["account_id"]] = item.get("account_name")
+        return result_map, partial
+
+    # ----- purchies -----
+
+    def get_purchy(self, account_id, purchy_ts):
+        resp = self._call(self.purchies_table.get_item, Key={"account_id": account_id, "purchy_ts": purchy_ts})
+        return resp.get("Item")
+
+    def put_purchy(self, item):
+        try:
+            self._call(
+                self.purchies_table.put_item,
+                Item=item,
+                ConditionExpression="attribute_not_exists(purchy_ts)",
+                ReturnValuesOnConditionCheckFailure="ALL_OLD"
+            )
+        except self.purchies_table.meta.client.exceptions.ConditionalCheckFailedException as e:
+            # after a 5xx our first attempt may have landed: then the stored row is ours
+            existing = from_ddb(e.response.get("Item") or {})
+            if getattr(e, "after_ambiguous_retry", False) and existing.get("purchy_id") == item.get("purchy_id"):
+                return
+            raise AlreadyExists(item.get("purchy_ts")) from e
+
+    def update_purchy(self, account_id, purchy_ts, set_fields, remove_fields):
+        expr_attr_names = {}
+        expr_attr_vals = {}
+        set_parts = []
+        remove_parts = []
+        for idx, (name, value) in enumerate(set_fields.items(), start=1):
+            expr_attr_names[f"#n{idx}"] = name
+            expr_attr_vals[f":v{idx}"] = value
+            set_parts.append(f"#n{idx} = :v{idx}")
+        for idx, name in enumerate(remove_fields, start=len(set_fields) + 1):
+            expr_attr_names[f"#n{idx}"] = name
+            remove_parts.append(f"#n{idx}")
+
+        update_expr = ""
+        if set_parts:
+            update_expr += "SET " + ", ".join(set_parts)
+        if remove_parts:
+            update_expr += " REMOVE " + ", ".join(remove_parts)
+
+        params = {
+            "Key": {"account_id": account_id, "purchy_ts": purchy_ts},
+            "UpdateExpression": update_expr.strip(),
+            "ConditionExpression": "attribute_exists(purchy_ts)",
+            "ExpressionAttributeNames": expr_attr_names,
+            "ReturnValues": "ALL_NEW"
+        }
+        if expr_attr_vals:
+            params["ExpressionAttributeValues"] = expr_attr_vals
+
+        try:
+            resp = self._call(self.purchies_table.update_item, **params)
+        except self.purchies_table.meta.client.exceptions.ConditionalCheckFailedException as e:
+            raise NotFound(purchy_ts) from e
+        return resp.get("Attributes", {})
+
+    def move_purchy(self, old_account_id, new_item):
+        purchy_ts = new_item["purchy_ts"]
+        delete_key = {"account_id": {"S": old_account_id}, "purchy_ts": {"S": purchy_ts}}
+        try:
+            self._call(
+                self.client.transact_write_items,
+                TransactItems=[
+                    {"Put": {"TableName": PURCHIES_TABLE, "Item": to_ddb(new_item), "ConditionExpression": "attribute_not_exists(purchy_ts)"}},
+                    {"Delete": {"TableName": PURCHIES_TABLE, "Key": delete_key, "ConditionExpression": "attribute_exists(purchy_ts)"}}
+                ],
+                # makes retries after a 5xx idempotent instead of failing on our own first attempt
+                ClientRequestToken=str(uuid.uuid4())
+            )
+        except self.client.exceptions.TransactionCanceledException as e:
+            print("TransactionCanceledException:", str(e))
+            codes = [r.get("Code") for r in e.response.get("CancellationReasons", [])]
+            if codes and codes[0] == "ConditionalCheckFailed":
+                raise AlreadyExists(purchy_ts) from e
+            if len(codes) > 1 and codes[1] == "ConditionalCheckFailed":
+                raise NotFound(purchy_ts) from e
+            raise
+
+    def delete_purchy(self, account_id, purchy_ts):
+        try:
+            self._call(
+                self.purchies_table.delete_item,
+                Key={"account_id": account_id, "purchy_ts": purchy_ts},
+                ConditionExpression="attribute_exists(purchy_ts)"
+            )
+        except self.purchies_table.meta.client.exceptions.ConditionalCheckFailedException as e:
+            if getattr(e, "after_ambiguous_retry", False):
+                # the attempt that failed with a 5xx already deleted it
+                return
+            raise NotFound(purchy_ts) from e
+
+    def sync_purchy(self, account_id, purchy_ts, item, expected):
+        """
+        Make the row under (account_id, purchy_ts) `item` (None = delete it), but only
+        while it still is `expected` (None = absent), i.e. nobody changed it upstream
+        since the last sync. Returns True once the row equals item, False on a conflict.
+        """
+        if item is None and expected is None:
+            return True
+        if expected is None:
+            condition, names, values = "attribute_not_exists(purchy_ts)", {}, {}
+        else:
+            condition, names, values = unchanged_condition(expected)
+        kwargs = {"ConditionExpression": condition}
+        if names:
+            kwargs["ExpressionAttributeNames"] = names
+        if values:
+            kwargs["ExpressionAttributeValues"] = values
+        try:
+            if item is None:
+                self._call(self.purchies_table.delete_item, Key={"account_id": account_id, "purchy_ts": purchy_ts}, **kwargs)
+            else:
+                self._call(self.purchies_table.put_item, Item=item, **kwargs)
+        except self.purchies_table.meta.client.exceptions.ConditionalCheckFailedException:
+            # already in the wanted state (e.g. an earlier sync got cut off) or a real conflict
+            return self.get_purchy(account_id, purchy_ts) == item
+        return True
+
+    def _query_account(self, account_id, from_ts, to_ts, projection=None, consistent=False):
+        """All purchies of one account in range, newest first (thread-safe: low-level client)."""
+        params = {
+            "TableName": PURCHIES_TABLE,
+            "KeyConditionExpression": "account_id = :aid AND purchy_ts BETWEEN :from_ts AND :to_ts",
+            "ExpressionAttributeValues": {
+                ":aid": {"S": account_id},
+                ":from_ts": {"S": from_ts},
+                ":to_ts": {"S": to_ts},
+            },
+            "ScanIndexForward": False,
+            "ConsistentRead": consistent
+        }
+        if projection:
+            params.update(projection)
+        items, partial = self._pages(self.client.query, params, f"query for {account_id}")
+        return [from_ddb(it) for it in items], partial
+
+    def _query_accounts(self, account_ids, from_ts, to_ts, projection=None, consistent=False):
+        """One Query per account on a bounded thread pool. Returns ([items per account], partial)."""
+        if len(account_ids) == 1:
+            items, partial = self._query_account(account_ids[0], from_ts, to_ts, projection, consistent)
+            return [items], partial
+        workers = max(1, min(MAX_QUERY_WORKERS, len(account_ids)))
+        deadline = ddb_resilience.current_deadline()
+
+        def query(aid):
+            # workers retry within the deadline of the request they serve
+            ddb_resilience.set_deadline(deadline)
+            return self._query_account(aid, from_ts, to_ts, projection, consistent)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(query, account_ids))
+        return [items for items, _ in results], any(p for _, p in results)
+
+    def query_purchies(self, account_ids, from_ts, to_ts, consistent=False):
+        streams, partial = self._query_accounts(account_ids, from_ts, to_ts, consistent=consistent)
+        return merge_newest_first(streams), partial
+
+    def scan_purchies(self, from_ts, to_ts, consistent=False, projection=None):
+        params = {
+            "TableName": PURCHIES_TABLE,
+            "FilterExpression": "purchy_ts BETWEEN :from_ts AND :to_ts",
+            "ExpressionAttributeValues": {":from_ts": {"S": from_ts}, ":to_ts": {"S": to_ts}},
+            "ConsistentRead": consistent,
+        }
+        if projection:
+            params.update(projection)
+        items, partial = self._pages(self.client.scan, params, "scan")
+        return [from_ddb(it) for it in items], partial
+
+    def purchy_totals(self, account_ids, from_ts, to_ts, consistent=False):
+        # DynamoDB cannot aggregate server-side; fetch only the numeric attributes
+        projection = {
+            "ProjectionExpression": "#w, #r, #a",
+            "ExpressionAttributeNames": {"#w": "weight", "#r": "rate", "#a": "amount"},
+        }
+        if account_ids is None:
+            items, partial = self.scan_purchies(from_ts, to_ts, consistent, projection)
+            streams = [items]
+        else:
+            streams, partial = self._query_accounts(account_ids, from_ts, to_ts, projection, consistent)
+        return sum_totals(it for items in streams for it in items), partial
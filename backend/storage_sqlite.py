@@ -0,0 +1,321 @@
+import os
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from decimal import Decimal, ROUND_HALF_UP
+
+from storage import PurchyStore, NotFound, AlreadyExists, to_decimal
+
+# Config from env
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "sugarcane.db")
+
+# Range reads go by (account_id, purchy_ts): the primary key serves per-account
+# ranges, idx_purchies_ts the ALL view.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    account_id   TEXT PRIMARY KEY,
+    account_name TEXT,
+    created_at   TEXT,
+    is_active    INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS purchies (
+    account_id  TEXT NOT NULL,
+    purchy_ts   TEXT NOT NULL,
+    purchy_id   TEXT,
+    purchy_date TEXT,
+    weight_milli INTEGER,        -- exact scaled integers (see SCALED_COLUMNS) so SUM stays exact
+    rate_paise   INTEGER,
+    amount_paise INTEGER,
+    note        TEXT,
+    extra       TEXT,            -- JSON for any other attribute (e.g. date, legacy_purchy_ts)
+    PRIMARY KEY (account_id, purchy_ts)
+);
+-- Change log for sync_upstream.py: one row per key written since the last sync.
+CREATE TABLE IF NOT EXISTS purchy_changes (
+    account_id TEXT NOT NULL,
+    purchy_ts  TEXT NOT NULL,
+    base       TEXT,             -- JSON of the row as last synced upstream, NULL if it never was
+    PRIMARY KEY (account_id, purchy_ts)
+);
+CREATE INDEX IF NOT EXISTS idx_purchies_ts ON purchies (purchy_ts);
+"""
+
+PURCHY_COLUMNS = ["account_id", "purchy_ts", "purchy_id", "purchy_date", "note"]
+# item field -> (column, decimal places kept); weights to 0.001, money to the paisa
+SCALED_COLUMNS = {
+    "weight": ("weight_milli", 3),
+    "rate": ("rate_paise", 2),
+    "amount": ("amount_paise", 2),
+}
+NUMERIC_COLUMNS = set(SCALED_COLUMNS)
+ROW_COLUMNS = PURCHY_COLUMNS + [col for col, _ in SCALED_COLUMNS.values()] + ["extra"]
+
+# Totals in SQL on integers: amount if stored, else weight * rate (same rule as
+# storage.item_amount), both in units of 10^-5 so the products stay exact
+TOTALS_SQL = (
+    "SELECT COUNT(*) AS count, SUM(weight_milli) AS weight_milli, "
+    "SUM(COALESCE(amount_paise * 1000, weight_milli * rate_paise)) AS amount_scaled "
+    "FROM purchies WHERE {where}"
+)
+AMOUNT_TOTAL_PLACES = 5
+
+
+def to_scaled(value, places):
+    value = to_decimal(value)
+    if value is None:
+        return None
+    return int(value.scaleb(places).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def from_scaled(value, places):
+    value = Decimal(value).scaleb(-places)
+    # drop the padding zeros (85.550 -> 85.55) without going to exponent form for integers
+    return value.quantize(Decimal(1)) if value == value.to_integral_value() else value.normalize()
+
+
+def row_to_purchy(row):
+    item = json.loads(row["extra"]) if row["extra"] else {}
+    for col in PURCHY_COLUMNS:
+        if row[col] is not None:
+            item[col] = row[col]
+    for field, (col, places) in SCALED_COLUMNS.items():
+        if row[col] is not None:
+            item[field] = from_scaled(row[col], places)
+    return item
+
+
+def purchy_to_row(item):
+    """Column values for ROW_COLUMNS."""
+    values = [item.get(col) for col in PURCHY_COLUMNS]
+    values += [to_scaled(item.get(field), places) for field, (_, places) in SCALED_COLUMNS.items()]
+    extra = {
+        k: (str(v) if isinstance(v, Decimal) else v)
+        for k, v in item.items() if k not in PURCHY_COLUMNS and k not in SCALED_COLUMNS
+    }
+    values.append(json.dumps(extra) if extra else None)
+    return values
+
+
+def dump_item(item):
+    return None if item is None else json.dumps(item, default=str, sort_keys=True)
+
+
+def load_item(text):
+    if text is None:
+        return None
+    item = json.loads(text)
+    for col in NUMERIC_COLUMNS & item.keys():
+        item[col] = Decimal(item[col])
+    return item
+
+
+def row_to_account(row):
+    return {
+        "account_id": row["account_id"],
+        "account_name": row["account_name"],
+        "created_at": row["created_at"],
+        "is_active": bool(row["is_active"]),
+    }
+
+
+class SQLiteStore(PurchyStore):
+    """
+    Embedded store for collection centres without connectivity (and for local testing).
+    One connection per thread; range queries use the primary key / indexes.
+    Weights, rates and amounts are kept as scaled integers, so totals are summed
+    exactly in SQL and match the DynamoDB store.
+
+    Every purchy write also records the key in purchy_changes, keeping the row as
+    it was at the last sync, so sync_upstream.py can push puts, edits, moves and
+    deletes without overwriting rows that were changed upstream meanwhile.
+    """
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # autocommit; writes take their own BEGIN IMMEDIATE (see _transaction)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Write transaction that holds the write lock from the start, so a row read
+        inside it cannot change before it is written back (concurrent requests of
+        local_server.py would otherwise lose updates).
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # ----- accounts -----
+
+    def put_account(self, item):
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO accounts (account_id, account_name, created_at, is_active) VALUES (?, ?, ?, ?)",
+                (item["account_id"], item.get("account_name"), item.get("created_at"), 1 if item.get("is_active", True) else 0)
+            )
+
+    def list_accounts(self):
+        rows = self._conn().execute("SELECT * FROM accounts").fetchall()
+        return [row_to_account(r) for r in rows], False
+
+    def get_account_names(self, account_ids):
+        account_ids = list(account_ids)
+        if not account_ids:
+            return {}, False
+        placeholders = ",".join("?" * len(account_ids))
+        rows = self._conn().execute(
+            f"SELECT account_id, account_name FROM accounts WHERE account_id IN ({placeholders})", account_ids
+        ).fetchall()
+        return {r["account_id"]: r["account_name"] for r in rows}, False
+
+    # ----- purchies -----
+
+    def get_purchy(self, account_id, purchy_ts):
+        return self._select(self._conn(), account_id, purchy_ts)
+
+    def _select(self, conn, account_id, purchy_ts):
+        row = conn.execute(
+            "SELECT * FROM purchies WHERE account_id = ? AND purchy_ts = ?", (account_id, purchy_ts)
+        ).fetchone()
+        return row_to_purchy(row) if row else None
+
+    def _record(self, conn, account_id, purchy_ts, before):
+        """Log a write; the first one since the last sync keeps `before` as the synced base."""
+        conn.execute(
+            "INSERT OR IGNORE INTO purchy_changes (account_id, purchy_ts, base) VALUES (?, ?, ?)",
+            (account_id, purchy_ts, dump_item(before))
+        )
+
+    def _insert(self, conn, item, verb="INSERT"):
+        conn.execute(
+            f"{verb} INTO purchies ({', '.join(ROW_COLUMNS)}) VALUES ({', '.join('?' * len(ROW_COLUMNS))})",
+            purchy_to_row(item)
+        )
+
+    def put_purchy(self, item):
+        try:
+            with self._transaction() as conn:
+                self._insert(conn, item)
+                self._record(conn, item["account_id"], item["purchy_ts"], None)
+        except sqlite3.IntegrityError as e:
+            raise AlreadyExists(item.get("purchy_ts")) from e
+
+    def update_purchy(self, account_id, purchy_ts, set_fields, remove_fields):
+        with self._transaction() as conn:
+            before = self._select(conn, account_id, purchy_ts)
+            if before is None:
+                raise NotFound(purchy_ts)
+            item = dict(before)
+            item.update(set_fields)
+            for name in remove_fields:
+                item.pop(name, None)
+            self._insert(conn, item, verb="INSERT OR REPLACE")
+            self._record(conn, account_id, purchy_ts, before)
+        return item
+
+    def move_purchy(self, old_account_id, new_item):
+        purchy_ts = new_item["purchy_ts"]
+        with self._transaction() as conn:
+            before = self._select(conn, old_account_id, purchy_ts)
+            if before is None:
+                raise NotFound(purchy_ts)
+            conn.execute(
+                "DELETE FROM purchies WHERE account_id = ? AND purchy_ts = ?", (old_account_id, purchy_ts)
+            )
+            try:
+                self._insert(conn, new_item)
+            except sqlite3.IntegrityError as e:
+                # leaving the with-block by exception rolls the delete back
+                raise AlreadyExists(purchy_ts) from e
+            # upstream sees a move as a delete of the old key and a put of the new one
+            self._record(conn, old_account_id, purchy_ts, before)
+            self._record(conn, new_item["account_id"], purchy_ts, None)
+
+    def delete_purchy(self, account_id, purchy_ts):
+        with self._transaction() as conn:
+            before = self._select(conn, account_id, purchy_ts)
+            if before is None:
+                raise NotFound(purchy_ts)
+            conn.execute(
+                "DELETE FROM purchies WHERE account_id = ? AND purchy_ts = ?", (account_id, purchy_ts)
+            )
+            self._record(conn, account_id, purchy_ts, before)
+
+    # ----- change log (sync_upstream.py) -----
+
+    def pending_changes(self):
+        """
+        Keys written since the last sync as dicts with "account_id", "purchy_ts",
+        "item" (the row now, None if deleted) and "base" (as last synced, None if never).
+        """
+        rows = self._conn().execute(
+            "SELECT c.account_id AS change_account_id, c.purchy_ts AS change_ts, c.base, p.* "
+            "FROM purchy_changes c LEFT JOIN purchies p "
+            "ON p.account_id = c.account_id AND p.purchy_ts = c.purchy_ts "
+            "ORDER BY c.purchy_ts"
+        ).fetchall()
+        return [{
+            "account_id": r["change_account_id"],
+            "purchy_ts": r["change_ts"],
+            "item": row_to_purchy(r) if r["account_id"] is not None else None,
+            "base": load_item(r["base"]),
+        } for r in rows]
+
+    def mark_synced(self, account_id, purchy_ts, synced_item):
+        """Upstream now holds synced_item (None = absent); forget the change unless the row moved on since."""
+        with self._transaction() as conn:
+            if self._select(conn, account_id, purchy_ts) == synced_item:
+                conn.execute(
+                    "DELETE FROM purchy_changes WHERE account_id = ? AND purchy_ts = ?", (account_id, purchy_ts)
+                )
+            else:
+                conn.execute(
+                    "UPDATE purchy_changes SET base = ? WHERE account_id = ? AND purchy_ts = ?",
+                    (dump_item(synced_item), account_id, purchy_ts)
+                )
+
+    def _where(self, account_ids, from_ts, to_ts):
+        clauses = ["purchy_ts BETWEEN ? AND ?"]
+        args = [from_ts, to_ts]
+        if account_ids is not None:
+            clauses.insert(0, f"account_id IN ({','.join('?' * len(account_ids))})")
+            args = list(account_ids) + args
+        return " AND ".join(clauses), args
+
+    def query_purchies(self, account_ids, from_ts, to_ts, consistent=False):
+        where, args = self._where(account_ids, from_ts, to_ts)
+        rows = self._conn().execute(
+            f"SELECT * FROM purchies WHERE {where} ORDER BY purchy_ts DESC", args
+        ).fetchall()
+        return [row_to_purchy(r) for r in rows], False
+
+    def scan_purchies(self, from_ts, to_ts, consistent=False):
+        where, args = self._where(None, from_ts, to_ts)
+        rows = self._conn().execute(f"SELECT * FROM purchies WHERE {where}", args).fetchall()
+        return [row_to_purchy(r) for r in rows], False
+
+    def purchy_totals(self, account_ids, from_ts, to_ts, consistent=False):
+        where, args = self._where(account_ids, from_ts, to_ts)
+        row = self._conn().execute(TOTALS_SQL.format(where=where), args).fetchone()
+        return {
+            "count": row["count"],
+            "total_weight": from_scaled(row["weight_milli"] or 0, SCALED_COLUMNS["weight"][1]),
+            "total_amount": from_scaled(row["amount_scaled"] or 0, AMOUNT_TOTAL_PLACES),
+        }, False
@@ -0,0 +1,57 @@
+"""
+Push a site's SQLite changes to DynamoDB once connectivity is back.
+
+SQLiteStore logs every purchy written since the last sync together with the
+row as it was then. Each change is applied upstream only while the DynamoDB
+row is still in that state: new purchies are only created, edits and deletes
+(a move is a delete plus a put) only go through on rows nobody changed
+upstream in the meantime. Conflicting rows are reported and stay pending;
+once both sides agree again (fix either one) the next sync clears them.
+Accounts are only created, never overwritten. Re-running is safe.
+
+Cached get_purchies views are invalidated for every purchy synced; set
+PURCHY_CACHE_SHARED / PURCHY_CACHE_TABLE_NAME like the deployed Lambdas.
+
+Usage:
+    python sync_upstream.py --db sugarcane.db
+"""
+import os
+import argparse
+
+# Reach the caches of the deployed Lambdas; must be set before purchy_cache is imported.
+os.environ.setdefault("PURCHY_CACHE_SHARED", "dynamodb")
+
+import purchy_cache
+from storage_sqlite import SQLiteStore
+from storage_dynamodb import DynamoDBStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync local purchies to DynamoDB")
+    parser.add_argument("--db", default="sugarcane.db", help="SQLite file to read")
+    args = parser.parse_args()
+
+    local = SQLiteStore(args.db)
+    upstream = DynamoDBStore()
+
+    accounts, _ = local.list_accounts()
+    for account in accounts:
+        upstream.put_account(account, only_new=True)
+
+    synced = 0
+    conflicts = 0
+    for change in local.pending_changes():
+        account_id, purchy_ts = change["account_id"], change["purchy_ts"]
+        if not upstream.sync_purchy(account_id, purchy_ts, change["item"], change["base"]):
+            conflicts += 1
+            print(f"Conflict, left pending: {account_id} {purchy_ts} was changed upstream since the last sync")
+            continue
+        local.mark_synced(account_id, purchy_ts, change["item"])
+        purchy_cache.invalidate(account_id, purchy_ts)
+        synced += 1
+
+    print(f"Synced {len(accounts)} accounts and {synced} purchy changes ({conflicts} conflicts)")
+
+
+if __name__ == "__main__":
+    main()
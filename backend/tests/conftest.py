@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import purchy_cache
+import storage
+from storage_sqlite import SQLiteStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteStore(str(tmp_path / "test.db"))
+
+
+@pytest.fixture
+def handlers_store(store):
+    """Route the Lambda handlers to a fresh SQLite store."""
+    storage.set_store(store)
+    yield store
+    storage.set_store(None)
+
+
+@pytest.fixture
+def shared_cache():
+    """Enable the get_purchies cache with the in-process shared tier."""
+    cache = purchy_cache.LocalSharedCache()
+    purchy_cache.set_shared_cache(cache)
+    yield cache
+    purchy_cache.set_shared_cache(None)
@@ -0,0 +1,234 @@
+import threading
+import time
+
+import pytest
+from botocore.exceptions import ClientError, EndpointConnectionError, ReadTimeoutError
+
+import ddb_resilience
+from ddb_resilience import Deadline, DeadlineExceeded, ThrottledError, TokenBucket
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    """No real sleeping and a fresh, roomy token bucket per test."""
+    monkeypatch.setattr(ddb_resilience, "_bucket", TokenBucket(1000, 1, 1000))
+    monkeypatch.setattr(ddb_resilience, "backoff_delay", lambda attempt: 0)
+    ddb_resilience.set_deadline(ddb_resilience.NO_DEADLINE)
+    yield
+    ddb_resilience.set_deadline(ddb_resilience.NO_DEADLINE)
+
+
+def client_error(code, reasons=None):
+    response = {"Error": {"Code": code, "Message": code}}
+    if reasons is not None:
+        response["CancellationReasons"] = [{"Code": r} for r in reasons]
+    return ClientError(response, "TestOperation")
+
+
+def failing(*errors, result="ok"):
+    """Callable raising the given errors in turn, then returning result."""
+    calls = []
+
+    def fn(**kwargs):
+        calls.append(kwargs)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+    fn.calls = calls
+    return fn
+
+
+@pytest.mark.parametrize("error, expected", [
+    (client_error("ProvisionedThroughputExceededException"), (True, True)),
+    (client_error("ThrottlingException"), (True, True)),
+    (client_error("InternalServerError"), (True, False)),
+    (client_error("ConditionalCheckFailedException"), (False, False)),
+    (client_error("ValidationException"), (False, False)),
+    (client_error("TransactionCanceledException", ["None", "ThrottlingError"]), (True, True)),
+    (client_error("TransactionCanceledException", ["TransactionConflict", "None"]), (True, False)),
+    (client_error("TransactionCanceledException", ["ConditionalCheckFailed", "ThrottlingError"]), (False, False)),
+    (client_error("TransactionCanceledException", ["ValidationError", "None"]), (False, False)),
+])
+def test_classify(error, expected):
+    assert ddb_resilience.classify(error) == expected
+
+
+def test_retries_throttles_and_slows_down():
+    fn = failing(client_error("ThrottlingException"), client_error("ThrottlingException"))
+
+    assert ddb_resilience.call(fn, Key=1) == "ok"
+
+    assert len(fn.calls) == 3
+    assert ddb_resilience._bucket.rate == 1000 / 4 + 1
+
+
+def test_gives_up_after_max_attempts():
+    fn = failing(*[client_error("ThrottlingException")] * ddb_resilience.MAX_ATTEMPTS)
+
+    with pytest.raises(ThrottledError):
+        ddb_resilience.call(fn)
+    assert len(fn.calls) == ddb_resilience.MAX_ATTEMPTS
+
+
+def test_throttled_transaction_is_retried():
+    fn = failing(client_error("TransactionCanceledException", ["ThrottlingError", "None"]))
+    assert ddb_resilience.call(fn) == "ok"
+    assert len(fn.calls) == 2
+
+
+def test_network_errors_are_retried():
+    fn = failing(EndpointConnectionError(endpoint_url="https://dynamodb"), ReadTimeoutError(endpoint_url="https://dynamodb"))
+    assert ddb_resilience.call(fn) == "ok"
+    assert len(fn.calls) == 3
+
+
+def test_persistent_network_errors_surface_as_overload():
+    fn = failing(*[EndpointConnectionError(endpoint_url="https://dynamodb")] * ddb_resilience.MAX_ATTEMPTS)
+    with pytest.raises(ddb_resilience.OVERLOAD_ERRORS):
+        ddb_resilience.call(fn)
+
+
+def test_non_retryable_errors_are_raised_untouched():
+    fn = failing(client_error("ConditionalCheckFailedException"))
+
+    with pytest.raises(ClientError) as raised:
+        ddb_resilience.call(fn)
+
+    assert len(fn.calls) == 1
+    assert raised.value.after_ambiguous_retry is False
+
+
+@pytest.mark.parametrize("first", [
+    client_error("InternalServerError"),
+    client_error("ServiceUnavailable"),
+    ReadTimeoutError(endpoint_url="https://dynamodb"),
+])
+def test_condition_failure_after_ambiguous_attempt_is_tagged(first):
+    fn = failing(first, client_error("ConditionalCheckFailedException"))
+
+    with pytest.raises(ClientError) as raised:
+        ddb_resilience.call(fn)
+
+    assert raised.value.after_ambiguous_retry is True
+
+
+def test_condition_failure_after_throttle_is_not_ambiguous():
+    # a throttled request was never applied
+    fn = failing(client_error("ThrottlingException"), client_error("ConditionalCheckFailedException"))
+
+    with pytest.raises(ClientError) as raised:
+        ddb_resilience.call(fn)
+
+    assert raised.value.after_ambiguous_retry is False
+
+
+def test_expired_deadline_stops_before_calling():
+    ddb_resilience.set_deadline(Deadline(time.monotonic() - 1))
+    fn = failing()
+
+    with pytest.raises(DeadlineExceeded):
+        ddb_resilience.call(fn)
+    assert fn.calls == []
+
+
+def test_no_retry_that_would_outlive_the_deadline(monkeypatch):
+    monkeypatch.setattr(ddb_resilience, "backoff_delay", lambda attempt: 5)
+    ddb_resilience.set_deadline(Deadline(time.monotonic() + 1))
+    fn = failing(client_error("ThrottlingException"))
+
+    with pytest.raises(DeadlineExceeded):
+        ddb_resilience.call(fn)
+    assert len(fn.calls) == 1
+
+
+def test_deadline_from_context():
+    class Context:
+        def get_remaining_time_in_millis(self):
+            return 3000
+
+    deadline = Deadline.from_context(Context(), reserve_ms=500)
+    assert 2.0 < deadline.remaining() <= 2.5
+    assert Deadline.from_context(None).remaining() == float("inf")
+
+
+def test_deadline_is_per_thread():
+    ddb_resilience.set_deadline(Deadline(time.monotonic() - 1))
+    seen = []
+    t = threading.Thread(target=lambda: seen.append(ddb_resilience.current_deadline()))
+    t.start()
+    t.join()
+
+    assert seen == [ddb_resilience.NO_DEADLINE]
+    assert ddb_resilience.current_deadline().expired()
+
+
+def test_token_bucket_is_aimd():
+    bucket = TokenBucket(8, 1, 10)
+
+    bucket.on_throttle()
+    assert bucket.rate == 4
+    for _ in range(10):
+        bucket.on_throttle()
+    assert bucket.rate == 1  # never below min_rate
+    for _ in range(20):
+        bucket.on_success()
+    assert bucket.rate == 10  # never above max_rate
+
+
+def test_token_bucket_waits_for_tokens():
+    bucket = TokenBucket(20, 1, 20)
+    start = time.monotonic()
+    for _ in range(25):
+        bucket.acquire(ddb_resilience.NO_DEADLINE)
+    # 20 burst + 5 more at 20/s
+    assert time.monotonic() - start >= 0.2
+
+
+def test_token_bucket_respects_deadline():
+    bucket = TokenBucket(1, 1, 1)
+    bucket.acquire(ddb_resilience.NO_DEADLINE)
+    with pytest.raises(DeadlineExceeded):
+        bucket.acquire(Deadline(time.monotonic() + 0.1))
+
+
+class BatchClient:
+    """batch_get_item stub that leaves `unprocessed_rounds` rounds of keys unprocessed."""
+
+    def __init__(self, unprocessed_rounds):
+        self.unprocessed_rounds = unprocessed_rounds
+        self.requests = []
+
+    def batch_get_item(self, RequestItems):
+        self.requests.append(RequestItems)
+        keys = RequestItems["T"]["Keys"]
+        if len(self.requests) <= self.unprocessed_rounds:
+            done, left = keys[:1], keys[1:]
+        else:
+            done, left = keys, []
+        resp = {"Responses": {"T": [dict(k) for k in done]}}
+        if left:
+            resp["UnprocessedKeys"] = {"T": {"Keys": left}}
+        return resp
+
+
+def test_batch_get_retries_unprocessed_keys():
+    client = BatchClient(unprocessed_rounds=2)
+    keys = [{"id": {"S": str(i)}} for i in range(4)]
+
+    responses, unprocessed = ddb_resilience.batch_get_item(client, {"T": {"Keys": keys}})
+
+    assert unprocessed == {}
+    assert sorted(r["id"]["S"] for r in responses["T"]) == ["0", "1", "2", "3"]
+    assert [len(r["T"]["Keys"]) for r in client.requests] == [4, 3, 2]
+    assert ddb_resilience._bucket.rate < 1000
+
+
+def test_batch_get_returns_what_it_has_when_attempts_run_out():
+    client = BatchClient(unprocessed_rounds=100)
+    keys = [{"id": {"S": str(i)}} for i in range(10)]
+
+    responses, unprocessed = ddb_resilience.batch_get_item(client, {"T": {"Keys": keys}})
+
+    assert len(client.requests) == ddb_resilience.MAX_ATTEMPTS
+    assert len(responses["T"]) == ddb_resilience.MAX_ATTEMPTS
+    assert len(unprocessed["T"]["Keys"]) == 10 - ddb_resilience.MAX_ATTEMPTS
@@ -0,0 +1,125 @@
+import json
+from decimal import Decimal
+
+import pytest
+
+import add_purchy
+import get_purchies
+import storage
+from storage import merge_newest_first
+
+
+def get(**params):
+    resp = get_purchies.lambda_handler({"httpMethod": "GET", "queryStringParameters": params}, None)
+    return resp, json.loads(resp["body"])
+
+
+def add(store, account_id, purchy_ts, weight):
+    store.put_purchy({"account_id": account_id, "purchy_ts": purchy_ts, "weight": Decimal(weight), "rate": Decimal("405")})
+
+
+def test_merge_newest_first_interleaves_streams():
+    a = [{"purchy_ts": "2025-01-05"}, {"purchy_ts": "2025-01-02"}]
+    b = [{"purchy_ts": "2025-01-04"}, {"purchy_ts": "2025-01-03"}, {"purchy_ts": "2025-01-01"}]
+    c = []
+
+    merged = [it["purchy_ts"] for it in merge_newest_first([a, b, c])]
+
+    assert merged == ["2025-01-05", "2025-01-04", "2025-01-03", "2025-01-02", "2025-01-01"]
+    assert merge_newest_first([a]) is a
+
+
+def test_multi_account_view_is_newest_first(handlers_store):
+    handlers_store.put_account({"account_id": "a", "account_name": "Ram"})
+    handlers_store.put_account({"account_id": "b", "account_name": "Shyam"})
+    add(handlers_store, "a", "2025-01-01T09:00:00+05:30", "1")
+    add(handlers_store, "b", "2025-01-02T09:00:00+05:30", "2")
+    add(handlers_store, "a", "2025-01-03T09:00:00+05:30", "3")
+    add(handlers_store, "c", "2025-01-04T09:00:00+05:30", "4")
+
+    resp, body = get(account_id="b,a")
+
+    assert resp["statusCode"] == 200
+    assert [it["purchy_ts"][:10] for it in body["items"]] == ["2025-01-03", "2025-01-02", "2025-01-01"]
+    assert [it["account_name"] for it in body["items"]] == ["Ram", "Shyam", "Ram"]
+    assert body["count"] == 3
+    assert body["total_weight"] == 6
+
+
+@pytest.mark.parametrize("account_id", ["ALL,a", ",", " , ", "  "])
+def test_malformed_account_lists_are_rejected(handlers_store, account_id):
+    resp, _ = get(account_id=account_id)
+    assert resp["statusCode"] == 400
+
+
+@pytest.mark.parametrize("params", [{}, {"account_id": ""}, {"account_id": "ALL"}, {"account_id": " all "}])
+def test_all_accounts(handlers_store, params):
+    add(handlers_store, "a", "2025-01-01T09:00:00+05:30", "1")
+    add(handlers_store, "b", "2025-01-02T09:00:00+05:30", "2")
+
+    resp, body = get(**params)
+
+    assert resp["statusCode"] == 200
+    assert body["count"] == 2
+
+
+def test_totals_format(handlers_store):
+    add(handlers_store, "a", "2025-01-01T09:00:00+05:30", "0.1")
+    add(handlers_store, "a", "2025-01-02T09:00:00+05:30", "0.2")
+
+    _, body = get(account_id="a", format="totals")
+
+    assert body == {"count": 2, "total_weight": 0.3, "total_amount": 121.5}
+
+
+def test_new_purchy_invalidates_cached_view(handlers_store, shared_cache):
+    add(handlers_store, "a", "2025-01-01T09:00:00+05:30", "1")
+    first, _ = get(account_id="a")
+    second, _ = get(account_id="a")
+    assert first["headers"]["X-Cache"] == "MISS"
+    assert second["headers"]["X-Cache"] == "HIT"
+
+    added = add_purchy.lambda_handler({"body": json.dumps({"account_id": "a", "date": "2025-01-05", "weight": 2})}, None)
+    assert added["statusCode"] == 200
+
+    third, body = get(account_id="a")
+    assert third["headers"]["X-Cache"] == "MISS"
+    assert body["count"] == 2
+
+
+class RecordingStore:
+    """Wraps a store and records the consistent flag of every range read."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.consistent = []
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    def query_purchies(self, account_ids, from_ts, to_ts, consistent=False):
+        self.consistent.append(consistent)
+        return self.inner.query_purchies(account_ids, from_ts, to_ts, consistent)
+
+    def purchy_totals(self, account_ids, from_ts, to_ts, consistent=False):
+        self.consistent.append(consistent)
+        return self.inner.purchy_totals(account_ids, from_ts, to_ts, consistent)
+
+
+def test_reads_that_get_cached_are_consistent(handlers_store, shared_cache):
+    recording = RecordingStore(handlers_store)
+    storage.set_store(recording)
+
+    get(account_id="a")
+    get(account_id="a", format="totals")
+
+    assert recording.consistent == [True, True]
+
+
+def test_reads_without_cache_stay_eventually_consistent(handlers_store):
+    recording = RecordingStore(handlers_store)
+    storage.set_store(recording)
+
+    get(account_id="a")
+
+    assert recording.consistent == [False]
@@ -0,0 +1,126 @@
+import pytest
+from botocore.stub import Stubber
+
+import ddb_resilience
+import purchy_cache
+
+JAN = ("2025-01-01T00:00:00Z", "2025-01-31T23:59:59Z")
+
+
+def cached(scope, from_ts, to_ts, body):
+    """Miss, then store `body` the way get_purchies does."""
+    hit, token = purchy_cache.lookup(scope, from_ts, to_ts)
+    assert hit is None
+    purchy_cache.store(scope, from_ts, to_ts, "json", body, token)
+
+
+def test_disabled_without_shared_tier():
+    purchy_cache.set_shared_cache(None)
+    assert not purchy_cache.enabled()
+    assert purchy_cache.lookup("a", *JAN) == (None, None)
+
+
+def test_hit_after_store(shared_cache):
+    cached("a", *JAN, "body")
+    assert purchy_cache.lookup("a", *JAN)[0] == "body"
+
+
+def test_write_in_range_invalidates_account_and_all_views(shared_cache):
+    cached("a", *JAN, "a-body")
+    cached(purchy_cache.ALL_SCOPE, *JAN, "all-body")
+
+    purchy_cache.invalidate("a", "2025-01-15T10:00:00+05:30#0000000000")
+
+    assert purchy_cache.lookup("a", *JAN)[0] is None
+    assert purchy_cache.lookup(purchy_cache.ALL_SCOPE, *JAN)[0] is None
+
+
+def test_write_elsewhere_keeps_entries(shared_cache):
+    cached("a", *JAN, "a-body")
+    cached("b", *JAN, "b-body")
+
+    purchy_cache.invalidate("a", "2025-03-01T10:00:00Z")  # other month
+    purchy_cache.invalidate("c", "2025-01-15T10:00:00Z")  # other account
+
+    assert purchy_cache.lookup("a", *JAN)[0] == "a-body"
+    assert purchy_cache.lookup("b", *JAN)[0] == "b-body"
+
+
+def test_multi_account_view_invalidated_by_any_member(shared_cache):
+    cached(["b", "a"], *JAN, "ab-body")
+    assert purchy_cache.lookup(["a", "b"], *JAN)[0] == "ab-body"
+
+    purchy_cache.invalidate("b", "2025-01-02T00:00:00Z")
+
+    assert purchy_cache.lookup(["a", "b"], *JAN)[0] is None
+
+
+def test_invalidation_reaches_other_containers(shared_cache):
+    """A writer only shares the shared tier with the reader, not the LRU."""
+    cached("a", *JAN, "a-body")
+
+    # another container: its own LRU, same shared tier
+    writer_lru = purchy_cache.LRUCache(8, 60)
+    reader_lru, purchy_cache._lru = purchy_cache._lru, writer_lru
+    try:
+        purchy_cache.invalidate("a", "2025-01-20T00:00:00Z")
+    finally:
+        purchy_cache._lru = reader_lru
+
+    assert purchy_cache.lookup("a", *JAN)[0] is None
+
+
+def test_write_racing_a_read_is_not_cached(shared_cache):
+    hit, token = purchy_cache.lookup("a", *JAN)
+    purchy_cache.invalidate("a", "2025-01-20T00:00:00Z")  # lands while the table is read
+    purchy_cache.store("a", *JAN, "json", "stale-body", token)
+
+    assert purchy_cache.lookup("a", *JAN)[0] is None
+
+
+@pytest.fixture
+def ddb_cache(monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "ap-south-1")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setattr(ddb_resilience, "backoff_delay", lambda attempt: 0)
+    cache = purchy_cache.DynamoDBSharedCache("PurchyCache")
+    purchy_cache.set_shared_cache(cache)
+    with Stubber(cache.client) as stubber:
+        yield cache, stubber
+        stubber.assert_no_pending_responses()
+    purchy_cache.set_shared_cache(None)
+
+
+def test_multi_account_token_is_one_consistent_batch_get(ddb_cache):
+    cache, stubber = ddb_cache
+    scopes = ["a", "b", "c"]
+    stubber.add_response(
+        "batch_get_item",
+        {"Responses": {"PurchyCache": [{"pk": {"S": "gen|b"}, "g_2025-01": {"N": "3"}}]}},
+        {"RequestItems": {"PurchyCache": {
+            "Keys": [{"pk": {"S": f"gen|{s}"}} for s in scopes],
+            "ConsistentRead": True,
+        }}},
+    )
+    stubber.add_response("get_item", {}, {"TableName": "PurchyCache", "Key": {"pk": {"S": "val|" + purchy_cache.cache_key(scopes, *JAN, "json")}}})
+
+    hit, token = purchy_cache.lookup(scopes, *JAN)
+
+    assert hit is None
+    assert token == [["b", "2025-01", 3]]
+
+
+def test_bump_is_retried_when_the_cache_table_throttles(ddb_cache):
+    cache, stubber = ddb_cache
+    params = {
+        "TableName": "PurchyCache",
+        "Key": {"pk": {"S": "gen|a"}},
+        "UpdateExpression": "ADD #b :one",
+        "ExpressionAttributeNames": {"#b": "g_2025-01"},
+        "ExpressionAttributeValues": {":one": {"N": "1"}},
+    }
+    stubber.add_client_error("update_item", "ProvisionedThroughputExceededException", http_status_code=400, expected_params=params)
+    stubber.add_response("update_item", {}, params)
+
+    cache.bump("a", "2025-01")
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import purchy_keys
+
+NOW = datetime(2025, 1, 10, 8, 30, 10, 123456, tzinfo=purchy_keys.IST)
+
+
+@pytest.fixture(autouse=True)
+def fresh_sequence(monkeypatch):
+    monkeypatch.setattr(purchy_keys, "_last_dt", None)
+    monkeypatch.setattr(purchy_keys, "_seq", 0)
+
+
+def test_format():
+    key = purchy_keys.new_purchy_ts(NOW)
+    ts, suffix = key.split(purchy_keys.KEY_SEPARATOR)
+    assert ts == "2025-01-10T08:30:10.123456+05:30"
+    assert len(suffix) == purchy_keys.SEQ_WIDTH + 6
+
+
+def test_same_instant_keys_sort_in_issue_order():
+    keys = [purchy_keys.new_purchy_ts(NOW) for _ in range(1000)]
+    assert keys == sorted(keys)
+    assert len(set(keys)) == len(keys)
+
+
+def test_sequence_overflow_moves_timestamp_on():
+    keys = [purchy_keys.new_purchy_ts(NOW) for _ in range(purchy_keys.SEQ_MAX + 3)]
+    assert keys == sorted(keys)
+    assert len(set(keys)) == len(keys)
+    assert keys[-1].startswith("2025-01-10T08:30:10.123457+05:30#0001")
+
+
+def test_clock_going_back_never_reorders():
+    first = purchy_keys.new_purchy_ts(NOW)
+    second = purchy_keys.new_purchy_ts(NOW - timedelta(seconds=5))
+    assert second > first
+
+
+def test_other_timezones_are_normalised_to_ist():
+    key = purchy_keys.new_purchy_ts(NOW.astimezone(timezone.utc))
+    assert key.startswith("2025-01-10T08:30:10.123456+05:30#")
+
+
+def test_new_keys_sort_after_legacy_keys_of_the_same_second():
+    legacy = "2025-01-10T08:30:10+05:30"
+    key = purchy_keys.new_purchy_ts(NOW)
+    assert legacy < key < "2025-01-10T08:30:11+05:30"
+    assert purchy_keys.is_legacy_key(legacy)
+    assert not purchy_keys.is_legacy_key(key)
+
+
+def test_migrated_key():
+    legacy = "2025-01-10T08:30:10+05:30"
+    assert purchy_keys.migrated_key(legacy) == "2025-01-10T08:30:10.000000+05:30#0000000000"
+    # still within the same second for from/to bounds, before keys issued later in it
+    assert legacy < purchy_keys.migrated_key(legacy) < purchy_keys.new_purchy_ts(NOW)
+    assert not purchy_keys.is_legacy_key(purchy_keys.migrated_key(legacy))
@@ -0,0 +1,56 @@
+import pytest
+from botocore.stub import Stubber
+
+import ddb_resilience
+import storage_dynamodb
+from storage_dynamodb import DynamoDBStore, PURCHIES_TABLE
+
+
+@pytest.fixture
+def ddb(monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "ap-south-1")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setattr(ddb_resilience, "backoff_delay", lambda attempt: 0)
+    store = DynamoDBStore()
+    with Stubber(store.client) as stubber:
+        yield store, stubber
+        stubber.assert_no_pending_responses()
+
+
+def query_params(account_id, consistent):
+    return {
+        "TableName": PURCHIES_TABLE,
+        "KeyConditionExpression": "account_id = :aid AND purchy_ts BETWEEN :from_ts AND :to_ts",
+        "ExpressionAttributeValues": {":aid": {"S": account_id}, ":from_ts": {"S": "a"}, ":to_ts": {"S": "z"}},
+        "ScanIndexForward": False,
+        "ConsistentRead": consistent,
+    }
+
+
+@pytest.mark.parametrize("consistent", [True, False])
+def test_query_passes_consistent_read(ddb, consistent):
+    store, stubber = ddb
+    stubber.add_response("query", {"Items": [{"account_id": {"S": "a"}, "purchy_ts": {"S": "m"}}]}, query_params("a", consistent))
+
+    items, partial = store.query_purchies(["a"], "a", "z", consistent)
+
+    assert [it["purchy_ts"] for it in items] == ["m"]
+    assert not partial
+
+
+def test_multi_account_query_merges_newest_first(ddb, monkeypatch):
+    store, stubber = ddb
+    # one worker keeps the queries in the order the responses are stubbed
+    monkeypatch.setattr(storage_dynamodb, "MAX_QUERY_WORKERS", 1)
+    rows = {"a": ["m3", "m1"], "b": ["m2"]}
+    for aid in ("a", "b"):
+        stubber.add_response(
+            "query",
+            {"Items": [{"account_id": {"S": aid}, "purchy_ts": {"S": ts}} for ts in rows[aid]]},
+            query_params(aid, True),
+        )
+
+    items, _ = store.query_purchies(["a", "b"], "a", "z", True)
+
+    assert [it["purchy_ts"] for it in items] == ["m3", "m2", "m1"]
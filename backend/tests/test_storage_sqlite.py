@@ -0,0 +1,184 @@
+import threading
+from decimal import Decimal
+
+import pytest
+
+from storage import AlreadyExists, NotFound
+
+
+def purchy(account_id, purchy_ts, **fields):
+    return {"account_id": account_id, "purchy_ts": purchy_ts, **fields}
+
+
+def test_put_and_get_round_trips_exact_decimals(store):
+    store.put_purchy(purchy("a", "2025-01-10T08:00:00+05:30#0000000001", weight=Decimal("85.55"), rate=405, note="n", date="2025-01-10"))
+
+    item = store.get_purchy("a", "2025-01-10T08:00:00+05:30#0000000001")
+    assert item["weight"] == Decimal("85.55")
+    assert str(item["weight"]) == "85.55"
+    assert item["rate"] == Decimal("405")
+    assert item["note"] == "n"
+    assert item["date"] == "2025-01-10"
+    assert store.get_purchy("a", "missing") is None
+
+
+def test_put_never_overwrites(store):
+    store.put_purchy(purchy("a", "t1", weight=Decimal("1")))
+    with pytest.raises(AlreadyExists):
+        store.put_purchy(purchy("a", "t1", weight=Decimal("2")))
+    assert store.get_purchy("a", "t1")["weight"] == Decimal("1")
+
+
+def test_update_sets_and_removes_fields(store):
+    store.put_purchy(purchy("a", "t1", weight=Decimal("1"), purchy_id="P1"))
+
+    item = store.update_purchy("a", "t1", {"weight": Decimal("2.5")}, ["purchy_id"])
+
+    assert item["weight"] == Decimal("2.5")
+    assert "purchy_id" not in store.get_purchy("a", "t1")
+    with pytest.raises(NotFound):
+        store.update_purchy("a", "missing", {"weight": Decimal("1")}, [])
+
+
+def test_delete(store):
+    store.put_purchy(purchy("a", "t1"))
+    store.delete_purchy("a", "t1")
+    assert store.get_purchy("a", "t1") is None
+    with pytest.raises(NotFound):
+        store.delete_purchy("a", "t1")
+
+
+def test_move_to_another_account(store):
+    store.put_purchy(purchy("a", "t1", weight=Decimal("3")))
+
+    store.move_purchy("a", purchy("b", "t1", weight=Decimal("3")))
+
+    assert store.get_purchy("a", "t1") is None
+    assert store.get_purchy("b", "t1")["weight"] == Decimal("3")
+
+
+def test_move_onto_taken_key_changes_nothing(store):
+    store.put_purchy(purchy("a", "t1", weight=Decimal("1")))
+    store.put_purchy(purchy("b", "t1", weight=Decimal("2")))
+
+    with pytest.raises(AlreadyExists):
+        store.move_purchy("a", purchy("b", "t1", weight=Decimal("1")))
+
+    assert store.get_purchy("a", "t1")["weight"] == Decimal("1")
+    assert store.get_purchy("b", "t1")["weight"] == Decimal("2")
+
+
+def test_move_missing_purchy(store):
+    with pytest.raises(NotFound):
+        store.move_purchy("a", purchy("b", "t1"))
+
+
+def test_totals_are_exact(store):
+    # 0.1 + 0.2 style values that drift when summed as floats
+    for i in range(10):
+        store.put_purchy(purchy("a", f"2025-01-{i + 10}T00:00:00Z", weight=Decimal("0.1"), rate=Decimal("0.2")))
+    store.put_purchy(purchy("b", "2025-01-15T00:00:00Z", weight=Decimal("1.1"), amount=Decimal("0.3")))
+    store.put_purchy(purchy("b", "2025-02-01T00:00:00Z", weight=Decimal("5")))
+
+    totals, partial = store.purchy_totals(["a", "b"], "2025-01-01T00:00:00Z", "2025-01-31T23:59:59Z")
+
+    assert not partial
+    assert totals == {"count": 11, "total_weight": Decimal("2.1"), "total_amount": Decimal("0.50")}
+    all_totals, _ = store.purchy_totals(None, "0000", "9999")
+    assert all_totals["count"] == 12
+    assert all_totals["total_weight"] == Decimal("7.1")
+
+
+def test_totals_are_pushed_down_to_sql(store):
+    store.put_purchy(purchy("a", "t1", weight=Decimal("85.5"), rate=Decimal("405")))
+    store.put_purchy(purchy("a", "t2", weight=Decimal("0.001"), rate=Decimal("0.01")))
+
+    totals, _ = store.purchy_totals(["a"], "t0", "t9")
+    row = store._conn().execute("SELECT weight_milli, rate_paise FROM purchies WHERE purchy_ts = 't1'").fetchone()
+
+    assert tuple(row) == (85500, 40500)
+    # sub-paisa products are summed exactly, not rounded per row
+    assert totals["total_amount"] == Decimal("34627.50001")
+    assert str(totals["total_weight"]) == "85.501"
+
+
+def test_query_filters_by_range_and_account(store):
+    store.put_purchy(purchy("a", "2025-01-01T10:00:00Z"))
+    store.put_purchy(purchy("a", "2025-02-01T10:00:00Z"))
+    store.put_purchy(purchy("b", "2025-01-05T10:00:00Z"))
+
+    items, _ = store.query_purchies(["a"], "2025-01-01T00:00:00Z", "2025-01-31T23:59:59Z")
+    assert [it["purchy_ts"] for it in items] == ["2025-01-01T10:00:00Z"]
+
+    items, _ = store.scan_purchies("2025-01-01T00:00:00Z", "2025-01-31T23:59:59Z")
+    assert sorted(it["account_id"] for it in items) == ["a", "b"]
+
+
+def test_concurrent_edits_do_not_lose_updates(store):
+    store.put_purchy(purchy("a", "t1", weight=Decimal("1")))
+    [change] = store.pending_changes()
+    store.mark_synced("a", "t1", change["item"])
+
+    def edit(n):
+        for i in range(20):
+            store.update_purchy("a", "t1", {f"field_{n}_{i}": "x"}, [])
+
+    threads = [threading.Thread(target=edit, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    item = store.get_purchy("a", "t1")
+    assert sum(k.startswith("field_") for k in item) == 8 * 20
+    # the sync base is still the row as last synced, not a half-edited one
+    [change] = store.pending_changes()
+    assert change["base"] == {"account_id": "a", "purchy_ts": "t1", "weight": Decimal("1")}
+
+def test_accounts(store):
+    store.put_account({"account_id": "a", "account_name": "Ram", "created_at": "2025-01-01T00:00:00+05:30", "is_active": True})
+    store.put_account({"account_id": "b", "account_name": "Shyam"})
+
+    accounts, partial = store.list_accounts()
+    assert not partial
+    assert {a["account_id"] for a in accounts} == {"a", "b"}
+    names, _ = store.get_account_names(["a", "missing"])
+    assert names == {"a": "Ram"}
+
+
+def test_change_log_tracks_base_since_last_sync(store):
+    store.put_purchy(purchy("a", "t1", weight=Decimal("1")))
+    store.put_purchy(purchy("a", "t2", weight=Decimal("2")))
+    store.put_purchy(purchy("a", "t3"))
+    for change in store.pending_changes():
+        store.mark_synced(change["account_id"], change["purchy_ts"], change["item"])
+    assert store.pending_changes() == []
+
+    store.update_purchy("a", "t1", {"weight": Decimal("5")}, [])
+    store.update_purchy("a", "t1", {"weight": Decimal("6")}, [])
+    store.move_purchy("a", purchy("b", "t2", weight=Decimal("2")))
+    store.delete_purchy("a", "t3")
+
+    changes = {(c["account_id"], c["purchy_ts"]): c for c in store.pending_changes()}
+    assert set(changes) == {("a", "t1"), ("a", "t2"), ("b", "t2"), ("a", "t3")}
+    # base stays what upstream last saw, item is the row now
+    assert changes[("a", "t1")]["base"]["weight"] == Decimal("1")
+    assert changes[("a", "t1")]["item"]["weight"] == Decimal("6")
+    # a move is a delete of the old key and a put of the new one
+    assert changes[("a", "t2")]["item"] is None
+    assert changes[("a", "t2")]["base"]["weight"] == Decimal("2")
+    assert changes[("b", "t2")]["base"] is None
+    assert changes[("a", "t3")]["item"] is None
+
+
+def test_mark_synced_keeps_changes_made_during_sync(store):
+    store.put_purchy(purchy("a", "t1", weight=Decimal("1")))
+    [change] = store.pending_changes()
+
+    store.update_purchy("a", "t1", {"weight": Decimal("2")}, [])
+    store.mark_synced("a", "t1", change["item"])
+
+    [change] = store.pending_changes()
+    assert change["base"]["weight"] == Decimal("1")
+    assert change["item"]["weight"] == Decimal("2")
+
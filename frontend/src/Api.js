@@ -63,10 +63,11 @@ export async function deletePurchy(account_id, purchy_ts) {
   return safeFetch(url, { method: "DELETE" });
 }
 
-/* Get purchies with optional filters */
+/* Get purchies with optional filters (account_id may be "ALL", one id, or an array of ids) */
 export async function getPurchies({ account_id = "ALL", from, to } = {}) {
   const params = new URLSearchParams();
-  params.set("account_id", account_id || "ALL");
+  const ids = Array.isArray(account_id) ? account_id.join(",") : account_id;
+  params.set("account_id", ids || "ALL");
   if (from) params.set("from", from);
   if (to) params.set("to", to);
   const url = `${API_BASE_URL}/purchies?${params.toString()}`;